@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from ..models.audit_log import AuditLog
+from .config import settings
+from .metrics import request_timings
+
+logger = logging.getLogger(__name__)
+
+class AuditWriter:
+    # Auditoría write-behind: los endpoints encolan eventos tras su commit y una tarea en segundo plano
+    # los inserta por lotes (un INSERT multi-fila por transacción), fuera de la latencia de la petición
+    def __init__(self, maxsize: int, batch_size: int, flush_interval: float, retry_max: float, retries: int = 5):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_max = retry_max
+        self.retries = retries
+        self._sessionmaker: Optional[async_sessionmaker] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.blocked = 0
+        self.write_errors = 0
+        self.dead_lettered = 0
+        self.lost = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and self._loop is asyncio.get_running_loop()
+
+    def start(self, sessionmaker: async_sessionmaker) -> None:
+        # Idempotente; se reinicia si el bucle de eventos ha cambiado (la cola está ligada a su bucle)
+        self._sessionmaker = sessionmaker
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._task = asyncio.create_task(self._run(self._queue))
+
+    async def record(
+        self,
+        action: str,
+        entity_type: str,
+        entity_id: Optional[int],
+        actor_id: Optional[int] = None,
+        details: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        event = {
+            "created_at": time.time(),
+            "actor_id": actor_id,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": entity_id,
+            "details": details,
+        }
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Backpressure: con la cola llena la petición espera a que el escritor libere hueco
+            self.blocked += 1
+            await self._queue.put(event)
+        self.enqueued += 1
+
+    async def flush(self, timeout: float = settings.AUDIT_FLUSH_TIMEOUT_SECONDS) -> bool:
+        # Espera (como mucho `timeout`) a que lo encolado hasta ahora esté en la base de datos;
+        # False si no ha dado tiempo y parte de los eventos siguen pendientes
+        if not self.running:
+            return True
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def stop(self, timeout: float = settings.AUDIT_SHUTDOWN_TIMEOUT_SECONDS) -> None:
+        # Vaciado en el shutdown del lifespan; lo que no se escriba en `timeout` se cuenta como perdido
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            self.lost += self._queue.qsize()
+            logger.error("Audit log shutdown timed out with %d pending events", self._queue.qsize())
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        # La tarea hereda el contexto de la petición que la arrancó: su SQL no debe contarse en esa petición
+        request_timings.set(None)
+        while True:
+            batch = [await queue.get()]
+            # Ventana corta para agrupar eventos en el mismo INSERT si el lote no está ya lleno
+            if queue.qsize() < self.batch_size - 1 and self.flush_interval > 0:
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await self._write(batch)
+            except Exception:
+                # Un fallo inesperado (p. ej. details no serializable) no puede detener al escritor
+                logger.exception("Audit log batch could not be written")
+                self._dead_letter(batch)
+            for _ in batch:
+                queue.task_done()
+
+    async def _insert(self, rows: List[dict]) -> None:
+        async with self._sessionmaker() as db:
+            await db.execute(insert(AuditLog).values(rows))
+            await db.commit()
+
+    async def _write(self, batch: List[dict]) -> None:
+        # Solo los errores transitorios (base bloqueada, conexión caída) se reintentan, con espera exponencial
+        # y un máximo de intentos; mientras tanto la cola se llena y aplica backpressure
+        delay = 0.1
+        for attempt in range(self.retries + 1):
+            try:
+                await self._insert(batch)
+            except OperationalError:
+                self.write_errors += 1
+                if attempt == self.retries:
+                    break
+                logger.warning("Audit log write of %d events failed, retrying in %.1fs", len(batch), delay, exc_info=True)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.retry_max)
+                continue
+            except SQLAlchemyError:
+                # Error permanente en el lote: se escriben uno a uno para no perder los eventos válidos
+                self.write_errors += 1
+                await self._write_each(batch)
+                return
+            self.written += len(batch)
+            self.batches += 1
+            return
+        self._dead_letter(batch)
+
+    async def _write_each(self, batch: List[dict]) -> None:
+        for event in batch:
+            try:
+                await self._insert([event])
+            except SQLAlchemyError:
+                self.write_errors += 1
+                self._dead_letter([event])
+            else:
+                self.written += 1
+        self.batches += 1
+
+    def _dead_letter(self, events: List[dict]) -> None:
+        # Los eventos que no se pueden escribir quedan en el log de errores, no bloquean al escritor
+        self.dead_lettered += len(events)
+        for event in events:
+            logger.error("Audit event dropped: %r", event)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_maxsize": self.maxsize,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "batches": self.batches,
+            "blocked": self.blocked,
+            "write_errors": self.write_errors,
+            "dead_lettered": self.dead_lettered,
+            "lost": self.lost,
+        }
+
+audit_writer = AuditWriter(
+    maxsize=settings.AUDIT_QUEUE_MAXSIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    retry_max=settings.AUDIT_RETRY_MAX_SECONDS,
+    retries=settings.AUDIT_WRITE_RETRIES,
+)
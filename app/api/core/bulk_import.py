@@ -0,0 +1,128 @@
+import json
+from typing import Any, AsyncIterator, List, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.user import User
+from ..schemas.user import UserBulkResult, UserCreate
+from .config import settings
+from .role_catalog import role_catalog
+from .security import get_password_hashes_async
+
+def _error(index: int, detail: str) -> UserBulkResult:
+    return UserBulkResult(index=index, status="error", detail=detail)
+
+def _validation_detail(exc: ValidationError) -> str:
+    error = exc.errors()[0]
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    # Parsear NDJSON a medida que llega, sin cargar el cuerpo completo
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+def _parse_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Se reporta como error de la fila correspondiente
+        return None
+
+async def import_batch(db: AsyncSession, batch: List[Tuple[int, Any]]) -> List[UserBulkResult]:
+    results: List[UserBulkResult] = []
+
+    # Validar cada fila con el mismo esquema que create_user
+    candidates: List[Tuple[int, UserCreate]] = []
+    for index, raw in batch:
+        if not isinstance(raw, dict):
+            results.append(_error(index, "Invalid JSON object"))
+            continue
+        try:
+            candidates.append((index, UserCreate.model_validate(raw)))
+        except ValidationError as exc:
+            results.append(_error(index, _validation_detail(exc)))
+
+    if candidates:
+        # Conflictos resueltos con una consulta IN por columna y lote; los roles, con el catálogo en memoria
+        usernames = {user.username for _, user in candidates}
+        emails = {user.email for _, user in candidates}
+        taken_usernames = set(await db.scalars(select(User.username).where(User.username.in_(usernames))))
+        taken_emails = set(await db.scalars(select(User.email).where(User.email.in_(emails))))
+        existing_roles = {
+            role_id for role_id in {user.role_id for _, user in candidates}
+            if await role_catalog.has_role(db, role_id)
+        }
+
+        accepted: List[Tuple[int, UserCreate]] = []
+        for index, user in candidates:
+            if user.username in taken_usernames:
+                results.append(_error(index, "Username already registered"))
+            elif user.email in taken_emails:
+                results.append(_error(index, "Email already registered"))
+            elif user.role_id not in existing_roles:
+                results.append(_error(index, "Role does not exist"))
+            else:
+                # Los duplicados dentro del propio lote también cuentan
+                taken_usernames.add(user.username)
+                taken_emails.add(user.email)
+                accepted.append((index, user))
+
+        if accepted:
+            hashes = await get_password_hashes_async([user.password for _, user in accepted])
+            rows = [
+                {
+                    "username": user.username,
+                    "email": user.email,
+                    "hashed_password": hashed_password,
+                    "role_id": user.role_id,
+                }
+                for (_, user), hashed_password in zip(accepted, hashes)
+            ]
+            try:
+                # executemany en una sola transacción por lote
+                inserted = await db.execute(
+                    insert(User).returning(User.id, sort_by_parameter_order=True),
+                    rows,
+                )
+                ids = list(inserted.scalars())
+                await db.commit()
+            except IntegrityError:
+                # Otra petición insertó los mismos valores entre la comprobación y el INSERT
+                await db.rollback()
+                results.extend(_error(index, "Conflict while inserting batch, retry these rows") for index, _ in accepted)
+            else:
+                results.extend(
+                    UserBulkResult(index=index, status="created", id=user_id)
+                    for (index, _), user_id in zip(accepted, ids)
+                )
+
+    results.sort(key=lambda result: result.index)
+    return results
+
+async def iter_json_array(items: List[Any]) -> AsyncIterator[Any]:
+    for item in items:
+        yield item
+
+async def import_users(db: AsyncSession, rows: AsyncIterator[Any]) -> List[UserBulkResult]:
+    # Agrupa la entrada en lotes de BULK_IMPORT_BATCH_SIZE filas
+    results: List[UserBulkResult] = []
+    batch: List[Tuple[int, Any]] = []
+    index = 0
+    async for raw in rows:
+        batch.append((index, raw))
+        index += 1
+        if len(batch) >= settings.BULK_IMPORT_BATCH_SIZE:
+            results.extend(await import_batch(db, batch))
+            batch = []
+    if batch:
+        results.extend(await import_batch(db, batch))
+    return results
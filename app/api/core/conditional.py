@@ -0,0 +1,37 @@
+from typing import List, Optional
+from fastapi import HTTPException, Request, Response, status
+
+# ETag fuerte a partir de la columna version de la fila (y de las filas incluidas con expand)
+def make_etag(*versions: int) -> str:
+    return '"' + "-".join(str(version) for version in versions) + '"'
+
+def _entity_tags(header: str) -> List[str]:
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    # If-None-Match usa comparación débil: W/"3" equivale a "3"
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return None
+    tags = _entity_tags(header)
+    if "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+def if_match_versions(request: Request) -> Optional[List[int]]:
+    # None: sin precondición (o "*"); lista vacía: ninguna etiqueta puede coincidir
+    header = request.headers.get("if-match")
+    if header is None:
+        return None
+    tags = _entity_tags(header)
+    if "*" in tags:
+        return None
+    versions = []
+    for tag in tags:
+        # If-Match usa comparación fuerte: las etiquetas débiles nunca coinciden
+        if len(tag) > 2 and tag[0] == tag[-1] == '"' and tag[1:-1].isdigit():
+            versions.append(int(tag[1:-1]))
+    return versions
+
+def precondition_failed() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Resource has been modified")
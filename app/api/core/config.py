@@ -1,8 +1,83 @@
 from pydantic import BaseSettings
+from typing import Literal, Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     SECRET_KEY: str
+    # URL para el engine asíncrono; si no se define se deriva de DATABASE_URL
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # "production" activa WAL y los pragmas SQLITE_* en cada conexión
+    DATABASE_PROFILE: str = "default"
+    # Literal: un valor desconocido falla al arrancar (SQLite lo ignoraría sin avisar)
+    SQLITE_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_MMAP_SIZE: int = 268435456
+    SQLITE_CACHE_SIZE: int = -65536  # Negativo: KiB (64 MiB)
+    SQLITE_TEMP_STORE: Literal["DEFAULT", "FILE", "MEMORY"] = "MEMORY"
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+
+    # Caché por proceso del token_version de cada usuario; el TTL acota cuánto tarda
+    # otro worker en rechazar tokens invalidados por un cambio de rol o contraseña
+    TOKEN_VERSION_CACHE_TTL_SECONDS: float = 5.0
+    TOKEN_VERSION_CACHE_MAXSIZE: int = 100000
+
+    # Caché de registros de usuario: "local" (LRU por proceso) o "redis" (compartida).
+    # Con USER_CACHE_REDIS_URL las invalidaciones se difunden por pub/sub a todos los workers;
+    # el TTL es la red de seguridad si se pierde un mensaje
+    USER_CACHE_BACKEND: str = "local"
+    USER_CACHE_TTL_SECONDS: float = 5.0
+    USER_CACHE_MAXSIZE: int = 100000
+    USER_CACHE_REDIS_URL: Optional[str] = None
+    USER_CACHE_CHANNEL: str = "user-cache-invalidations"
+
+    # Cada cuánto se compara la versión del catálogo de roles con la base de datos
+    ROLE_CATALOG_SYNC_SECONDS: float = 5.0
+
+    # Entradas de la caché de tokens verificados (0 la desactiva)
+    TOKEN_CACHE_SIZE: int = 10000
+
+    # Refresh tokens y denylist de tokens revocados
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_SECONDS: float = 5.0
+
+    # Limitación de intentos de login (token bucket por username y por IP)
+    LOGIN_RATE_LIMIT_ENABLED: bool = True
+    LOGIN_USERNAME_RATE_PER_MINUTE: float = 10
+    LOGIN_USERNAME_BURST: int = 5
+    LOGIN_IP_RATE_PER_MINUTE: float = 60
+    LOGIN_IP_BURST: int = 20
+    LOGIN_LIMITER_MAX_KEYS: int = 100000
+    LOGIN_LIMITER_SHARDS: int = 16
+
+    # Executor dedicado para bcrypt: "thread" o "process"
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 256
+
+    # Métricas Prometheus en /metrics y cabecera Server-Timing opcional
+    METRICS_ENABLED: bool = True
+    METRICS_SERVER_TIMING: bool = False
+
+    # Auditoría write-behind: cola acotada en memoria volcada por lotes a audit_log
+    AUDIT_QUEUE_MAXSIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 500
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 0.1
+    AUDIT_RETRY_MAX_SECONDS: float = 5.0
+    AUDIT_WRITE_RETRIES: int = 5  # Reintentos de un lote ante errores transitorios antes de descartarlo
+    AUDIT_FLUSH_TIMEOUT_SECONDS: float = 1.0  # Espera máxima de GET /audit por la cola pendiente
+    AUDIT_SHUTDOWN_TIMEOUT_SECONDS: float = 10.0
+    AUDIT_PAGE_MAX: int = 1000
+
+    # Filas por lote al exportar en streaming
+    EXPORT_CHUNK_SIZE: int = 1000
+    # Filas por transacción en la importación masiva
+    BULK_IMPORT_BATCH_SIZE: int = 500
+    # Máximo de ids por consulta en /users/batch
+    USER_BATCH_MAX_IDS: int = 1000
 
     class Config:
         env_file = ".env"
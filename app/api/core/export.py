@@ -0,0 +1,25 @@
+import csv
+import io
+from typing import AsyncIterator, Sequence, Union
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from .config import settings
+from .serialization import encode_ndjson
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def _encode_csv(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+async def stream_rows(session_factory: async_sessionmaker, statement, keys: Sequence[str], format: str) -> AsyncIterator[Union[str, bytes]]:
+    # La sesión vive lo que dura el streaming (no la de la dependencia, que se cierra antes)
+    if format == "csv":
+        yield _encode_csv([keys])
+    async with session_factory() as db:
+        result = await db.stream(statement.execution_options(yield_per=settings.EXPORT_CHUNK_SIZE))
+        async for rows in result.partitions():
+            yield _encode_csv(rows) if format == "csv" else encode_ndjson(keys, rows)
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from threading import Lock
+from typing import Any, Callable, Iterable, List, Optional
+from fastapi import HTTPException, status
+from .config import settings
+from .metrics import record_hash_time
+
+def _timed_call(fn: Callable, *args) -> tuple:
+    # Se ejecuta dentro del worker: devuelve el instante de inicio para medir la espera en cola
+    started = time.monotonic()
+    result = fn(*args)
+    return started, time.monotonic() - started, result
+
+class HashingPool:
+    # Executor dedicado y acotado para bcrypt, fuera del threadpool de FastAPI
+    def __init__(self, kind: str, workers: int, max_pending: int):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown password hash executor: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._lock = Lock()
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.run_seconds_total = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == "process":
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="hashing")
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        return max(0, self.in_flight - self.workers)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        with self._lock:
+            if self.in_flight >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Password hashing is overloaded, try again later",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+        submitted_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        try:
+            started, elapsed, result = await loop.run_in_executor(self._get_executor(), _timed_call, fn, *args)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+        wait = max(0.0, started - submitted_at)
+        with self._lock:
+            self.completed += 1
+            self.wait_seconds_total += wait
+            self.wait_seconds_max = max(self.wait_seconds_max, wait)
+            self.run_seconds_total += elapsed
+        record_hash_time(elapsed)
+        return result
+
+    async def map(self, fn: Callable, items: Iterable[tuple]) -> List[Any]:
+        # Procesa lotes sin ocupar más de `workers` huecos a la vez (deja sitio a los logins)
+        semaphore = asyncio.Semaphore(self.workers)
+
+        async def _run(args: tuple) -> Any:
+            async with semaphore:
+                return await self.run(fn, *args)
+
+        return await asyncio.gather(*(_run(args) for args in items))
+
+    def stats(self) -> dict:
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_seconds_total": self.wait_seconds_total,
+            "wait_seconds_max": self.wait_seconds_max,
+            "run_seconds_total": self.run_seconds_total,
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+hashing_pool = HashingPool(
+    kind=settings.PASSWORD_HASH_EXECUTOR,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+)
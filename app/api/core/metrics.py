@@ -0,0 +1,186 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+class Counter:
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Labels, float] = {}
+        self._lock = Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        # Por etiquetas: conteos por bucket (no acumulados), suma y total
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+        self._lock = Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', repr(bound)))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(labels, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: list = []
+        # Funciones que devuelven gauges {nombre: valor} en el momento del scrape
+        self._collectors: List[Tuple[str, Callable[[], Dict[str, float]]]] = []
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        metric = Counter(name, documentation)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, prefix: str, collector: Callable[[], Dict[str, float]]) -> None:
+        self._collectors.append((prefix, collector))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, collector in self._collectors:
+            for key, value in collector().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                lines.append(f"# TYPE {prefix}_{key} gauge")
+                lines.append(f"{prefix}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram("http_request_duration_seconds", "HTTP request latency by route")
+REQUEST_SQL_STATEMENTS = registry.counter("http_request_sql_statements_total", "SQL statements executed by route")
+REQUEST_SQL_SECONDS = registry.counter("http_request_sql_seconds_total", "Time spent in SQL by route")
+REQUEST_HASH_SECONDS = registry.counter("http_request_hash_seconds_total", "Time spent in password hashing by route")
+REQUEST_JWT_SECONDS = registry.counter("http_request_jwt_seconds_total", "Time spent verifying JWTs by route")
+SQL_DURATION = registry.histogram("db_statement_duration_seconds", "SQL statement latency")
+
+@dataclass
+class RequestTimings:
+    sql_statements: int = 0
+    sql_seconds: float = 0.0
+    hash_seconds: float = 0.0
+    jwt_seconds: float = 0.0
+
+# Tiempos de la petición en curso (None fuera de una petición HTTP)
+request_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+def record_hash_time(seconds: float) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings.hash_seconds += seconds
+
+def record_jwt_time(seconds: float) -> None:
+    timings = request_timings.get()
+    if timings is not None:
+        timings.jwt_seconds += seconds
+
+def install_sql_listeners(sync_engine: Engine) -> None:
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        SQL_DURATION.observe(elapsed)
+        timings = request_timings.get()
+        if timings is not None:
+            timings.sql_statements += 1
+            timings.sql_seconds += elapsed
+
+class MetricsMiddleware:
+    # Middleware ASGI puro (sin BaseHTTPMiddleware) para que el coste por petición sea mínimo
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    total_ms = (time.perf_counter() - started) * 1000
+                    header = (
+                        f"sql;dur={timings.sql_seconds * 1000:.2f};desc=\"{timings.sql_statements} statements\", "
+                        f"hash;dur={timings.hash_seconds * 1000:.2f}, "
+                        f"jwt;dur={timings.jwt_seconds * 1000:.2f}, "
+                        f"app;dur={total_ms:.2f}"
+                    )
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_timings.reset(token)
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": getattr(route, "path", "unmatched")}
+            REQUEST_DURATION.observe(time.perf_counter() - started, status=str(status_code), **labels)
+            REQUEST_SQL_STATEMENTS.inc(timings.sql_statements, **labels)
+            REQUEST_SQL_SECONDS.inc(timings.sql_seconds, **labels)
+            REQUEST_HASH_SECONDS.inc(timings.hash_seconds, **labels)
+            REQUEST_JWT_SECONDS.inc(timings.jwt_seconds, **labels)
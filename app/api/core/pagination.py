@@ -0,0 +1,38 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException, Response
+from typing import Any, List, Optional
+
+# Cabecera con el cursor opaco de la siguiente página (el cuerpo sigue siendo una lista)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int = 1) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, binascii.Error):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def apply_keyset(query, column, cursor: Optional[str], skip: int, limit: int):
+    # Con cursor se continúa desde el último id visto; sin él se mantiene skip/limit
+    if cursor:
+        (last_id,) = decode_cursor(cursor)
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(column > last_id)
+    elif skip:
+        query = query.offset(skip)
+    return query.order_by(column).limit(limit)
+
+def set_next_cursor(response: Response, rows: list, limit: int, key=lambda row: row.id) -> None:
+    # Solo hay siguiente página si esta viene completa
+    if rows and len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([key(rows[-1])])
@@ -0,0 +1,81 @@
+import math
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import List, Tuple
+from .config import settings
+
+class TokenBucketLimiter:
+    # Token bucket por clave, repartido en shards con su propio lock y expulsión LRU de claves inactivas
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int, shards: int = 16):
+        # Una tasa de 0 no repondría nunca el bucket (y el Retry-After dividiría entre 0)
+        if rate_per_minute <= 0:
+            raise ValueError(f"Rate limit must be positive, got {rate_per_minute} per minute")
+        if burst < 1:
+            raise ValueError(f"Rate limit burst must be at least 1, got {burst}")
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._max_keys_per_shard = max(1, max_keys // shards)
+        self._shards: List[Tuple[Lock, "OrderedDict[str, Tuple[float, float]]"]] = [
+            (Lock(), OrderedDict()) for _ in range(shards)
+        ]
+
+    def acquire(self, key: str) -> float:
+        # Devuelve 0 si se permite el intento o los segundos hasta el siguiente token
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            tokens, updated = buckets.get(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            buckets[key] = (tokens, now)
+            buckets.move_to_end(key)
+            if len(buckets) > self._max_keys_per_shard:
+                buckets.popitem(last=False)
+        return 0.0 if allowed else (1.0 - tokens) / self.rate
+
+    def __len__(self) -> int:
+        return sum(len(buckets) for _, buckets in self._shards)
+
+    def clear(self) -> None:
+        for lock, buckets in self._shards:
+            with lock:
+                buckets.clear()
+
+class LoginThrottle:
+    # Límite combinado por username y por IP de cliente
+    def __init__(self):
+        self.by_username = TokenBucketLimiter(
+            settings.LOGIN_USERNAME_RATE_PER_MINUTE,
+            settings.LOGIN_USERNAME_BURST,
+            settings.LOGIN_LIMITER_MAX_KEYS,
+            settings.LOGIN_LIMITER_SHARDS,
+        )
+        self.by_ip = TokenBucketLimiter(
+            settings.LOGIN_IP_RATE_PER_MINUTE,
+            settings.LOGIN_IP_BURST,
+            settings.LOGIN_LIMITER_MAX_KEYS,
+            settings.LOGIN_LIMITER_SHARDS,
+        )
+        self.rejected = 0
+
+    def check(self, username: str, client_ip: str) -> int:
+        # Segundos de Retry-After, 0 si el intento puede continuar
+        if not settings.LOGIN_RATE_LIMIT_ENABLED:
+            return 0
+        # Primero la IP: un cliente ya limitado no consume el bucket del username
+        # (si no, podría bloquear a la víctima desde una IP rechazada)
+        retry_after = self.by_ip.acquire(client_ip)
+        if retry_after == 0:
+            retry_after = self.by_username.acquire(username.lower())
+        if retry_after > 0:
+            self.rejected += 1
+        return math.ceil(retry_after)
+
+    def clear(self) -> None:
+        self.by_username.clear()
+        self.by_ip.clear()
+
+login_throttle = LoginThrottle()
@@ -0,0 +1,101 @@
+import hashlib
+import math
+import time
+from threading import Lock
+from typing import Dict
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.revoked_token import RevokedToken
+from .config import settings
+
+class BloomFilter:
+    # Pre-check en memoria: "no" es definitivo, "sí" se confirma contra el set
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.sha256(key.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+class RevocationStore:
+    # Denylist de tokens por jti: comprobación O(1) en memoria, persistida en la tabla revoked_tokens
+    def __init__(self, capacity: int, error_rate: float, sync_seconds: float):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_seconds = sync_seconds
+        self._lock = Lock()
+        self._bloom = BloomFilter(capacity, error_rate)
+        self._revoked: Dict[str, int] = {}
+        self._last_id = 0
+        self._last_sync = 0.0
+
+    def _add(self, jti: str, expires_at: int) -> None:
+        with self._lock:
+            self._revoked[jti] = expires_at
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: str) -> bool:
+        if jti not in self._bloom:
+            return False
+        return jti in self._revoked
+
+    def _purge_expired(self, now: int) -> None:
+        # El Bloom filter no admite borrados: se reconstruye sin los expirados
+        with self._lock:
+            live = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+            if len(live) == len(self._revoked):
+                return
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            for jti in live:
+                bloom.add(jti)
+            self._revoked, self._bloom = live, bloom
+
+    async def sync(self, db: AsyncSession, force: bool = False) -> None:
+        # Incorpora las revocaciones hechas por otros workers (como mucho cada sync_seconds)
+        if not force and time.monotonic() - self._last_sync < self.sync_seconds:
+            return
+        self._last_sync = time.monotonic()
+        now = int(time.time())
+        result = await db.execute(
+            select(RevokedToken.id, RevokedToken.jti, RevokedToken.expires_at)
+            .where(RevokedToken.id > self._last_id, RevokedToken.expires_at > now)
+            .order_by(RevokedToken.id)
+        )
+        for row in result:
+            self._add(row.jti, row.expires_at)
+            self._last_id = row.id
+        self._purge_expired(now)
+
+    async def revoke(self, db: AsyncSession, jti: str, expires_at: int) -> bool:
+        # True si esta llamada ha revocado el token; False si ya estaba revocado (el UNIQUE de jti
+        # decide entre peticiones concurrentes, también de otros workers)
+        self._add(jti, expires_at)
+        db.add(RevokedToken(jti=jti, expires_at=expires_at))
+        try:
+            # INSERT antes de la purga (la sesión no hace autoflush); después, limpieza oportunista de las filas ya expiradas
+            await db.flush()
+            await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= int(time.time())))
+            await db.commit()
+        except IntegrityError:
+            # Ya estaba revocado
+            await db.rollback()
+            return False
+        return True
+
+revocation_store = RevocationStore(
+    capacity=settings.REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.REVOCATION_BLOOM_ERROR_RATE,
+    sync_seconds=settings.REVOCATION_SYNC_SECONDS,
+)
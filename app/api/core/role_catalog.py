@@ -0,0 +1,76 @@
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..models.catalog_version import CatalogVersion
+from ..models.role import Role
+from .config import settings
+
+ADMIN_ROLE_NAME = "admin"
+CATALOG_NAME = "roles"
+
+@dataclass(frozen=True)
+class RoleSnapshot:
+    # Copia inmutable de la tabla roles; se sustituye entera, nunca se modifica
+    by_id: Mapping[int, str] = field(default_factory=lambda: MappingProxyType({}))
+    by_name: Mapping[str, int] = field(default_factory=lambda: MappingProxyType({}))
+    admin_id: Optional[int] = None
+    version: int = -1
+
+    def is_admin(self, role_id: int) -> bool:
+        return self.admin_id is not None and role_id == self.admin_id
+
+class RoleCatalog:
+    def __init__(self, sync_seconds: float):
+        self.sync_seconds = sync_seconds
+        self.snapshot = RoleSnapshot()
+        self._last_check = 0.0
+
+    async def _current_version(self, db: AsyncSession) -> int:
+        version = await db.scalar(select(CatalogVersion.version).where(CatalogVersion.name == CATALOG_NAME))
+        return version or 0
+
+    async def load(self, db: AsyncSession) -> RoleSnapshot:
+        version = await self._current_version(db)
+        rows = (await db.execute(select(Role.id, Role.name))).all()
+        by_id = {row.id: row.name for row in rows}
+        by_name = {row.name: row.id for row in rows}
+        # Asignación atómica: los lectores ven la copia anterior o la nueva, nunca una mezcla
+        self.snapshot = RoleSnapshot(
+            by_id=MappingProxyType(by_id),
+            by_name=MappingProxyType(by_name),
+            admin_id=by_name.get(ADMIN_ROLE_NAME),
+            version=version,
+        )
+        self._last_check = time.monotonic()
+        return self.snapshot
+
+    async def refresh_if_stale(self, db: AsyncSession) -> RoleSnapshot:
+        # Comprobar el sello de versión (otros workers) como mucho cada sync_seconds
+        if self.snapshot.version >= 0 and time.monotonic() - self._last_check < self.sync_seconds:
+            return self.snapshot
+        self._last_check = time.monotonic()
+        if self.snapshot.version < 0 or await self._current_version(db) != self.snapshot.version:
+            await self.load(db)
+        return self.snapshot
+
+    async def has_role(self, db: AsyncSession, role_id: int) -> bool:
+        snapshot = await self.refresh_if_stale(db)
+        if role_id in snapshot.by_id:
+            return True
+        # Un fallo puede deberse a un rol recién creado fuera de este proceso
+        return role_id in (await self.load(db)).by_id
+
+    async def bump_version(self, db: AsyncSession) -> None:
+        # Se ejecuta dentro de la transacción que modifica roles, antes del commit
+        result = await db.execute(
+            update(CatalogVersion)
+            .where(CatalogVersion.name == CATALOG_NAME)
+            .values(version=CatalogVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            await db.execute(insert(CatalogVersion).values(name=CATALOG_NAME, version=1))
+
+role_catalog = RoleCatalog(sync_seconds=settings.ROLE_CATALOG_SYNC_SECONDS)
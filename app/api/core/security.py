@@ -1,7 +1,14 @@
+import hashlib
+import time
+import uuid
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from typing import List
+from ..core.cache import TTLCache
 from ..core.config import settings
+from ..core.hashing import hashing_pool
+from ..core.metrics import record_jwt_time
 from fastapi import HTTPException, status
 
 # Configuración para hashing de contraseñas
@@ -11,25 +18,82 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Caché de claims ya verificados, indexada por el digest del token; cada entrada caduca en su `exp`
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
-def create_access_token(data: dict) -> str:
+# Variantes asíncronas: bcrypt se ejecuta en el executor acotado de hashing
+async def get_password_hash_async(password: str) -> str:
+    return await hashing_pool.run(get_password_hash, password)
+
+async def get_password_hashes_async(passwords: List[str]) -> List[str]:
+    return await hashing_pool.map(get_password_hash, [(password,) for password in passwords])
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_pool.run(verify_password, plain_password, hashed_password)
+
+def token_claims(user_id: int, username: str, role_id: int, role_name: str, token_version: int) -> dict:
+    # Claims autocontenidos: el principal se construye sin consultar la base de datos
+    return {"sub": username, "uid": user_id, "role_id": role_id, "role": role_name, "tv": token_version}
+
+def _create_token(data: dict, token_type: str, expires_delta: timedelta) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    expire = datetime.utcnow() + expires_delta
+    # jti identifica el token para poder revocarlo
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": token_type})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def decode_access_token(token: str):
-    try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+def create_access_token(data: dict) -> str:
+    return _create_token(data, "access", timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+def create_refresh_token(data: dict) -> str:
+    return _create_token(data, "refresh", timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+
+def _decode_token(token: str, token_type: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()
+    claims = token_cache.get(key)
+    if claims is None:
+        started = time.perf_counter()
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+        finally:
+            record_jwt_time(time.perf_counter() - started)
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("jti") is None:
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-        return {"username": username}
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
\ No newline at end of file
+        # Los tokens sin claims de principal (emitidos antes de incluirlos) ya no son válidos
+        if not all(isinstance(payload.get(claim), int) for claim in ("uid", "role_id", "tv")):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+
+        # Solo se cachean tokens válidos, hasta su propia expiración
+        claims = {
+            "username": username,
+            "uid": payload["uid"],
+            "role_id": payload["role_id"],
+            "role": payload.get("role", ""),
+            "tv": payload["tv"],
+            "jti": payload["jti"],
+            "type": payload.get("type"),
+            "exp": payload["exp"],
+        }
+        ttl = payload["exp"] - time.time()
+        if ttl > 0 and token_cache.maxsize > 0:
+            token_cache.set(key, claims, ttl=ttl)
+
+    if claims["type"] != token_type:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return claims
+
+def decode_access_token(token: str):
+    return _decode_token(token, "access")
+
+def decode_refresh_token(token: str):
+    return _decode_token(token, "refresh")
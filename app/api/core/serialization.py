@@ -0,0 +1,17 @@
+from typing import Any, Iterable, Sequence
+import orjson
+from fastapi import Response
+
+def encode_rows(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    # Tuplas de columnas -> lista JSON de objetos, sin instancias ORM ni validación Pydantic por fila
+    return orjson.dumps([dict(zip(keys, row)) for row in rows])
+
+def encode_ndjson(keys: Sequence[str], rows: Iterable[Sequence[Any]]) -> bytes:
+    return b"".join(orjson.dumps(dict(zip(keys, row))) + b"\n" for row in rows)
+
+class RowsJSONResponse(Response):
+    # Respuesta de listados: el response_model de la ruta sigue documentando el esquema
+    media_type = "application/json"
+
+    def __init__(self, keys: Sequence[str], rows: Iterable[Sequence[Any]], **kwargs):
+        super().__init__(content=encode_rows(keys, rows), **kwargs)
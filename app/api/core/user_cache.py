@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import orjson
+from .cache import TTLCache
+from .config import settings
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_LAG = registry.histogram(
+    "user_cache_invalidation_lag_seconds",
+    "Delay between a committed user write and its invalidation reaching this worker",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+class LocalUserBackend:
+    # LRU en memoria del proceso: cada worker tiene su copia y depende de las invalidaciones por pub/sub
+    name = "local"
+    shared = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.errors = 0
+
+    async def get_many(self, ids: Iterable[int]) -> Dict[int, dict]:
+        found = {}
+        for user_id in ids:
+            record = self._cache.get(user_id)
+            if record is not None:
+                found[user_id] = record
+        return found
+
+    async def set_many(self, records: Dict[int, dict]) -> None:
+        for user_id, record in records.items():
+            self._cache.set(user_id, record)
+
+    async def delete_many(self, ids: Iterable[int]) -> None:
+        for user_id in ids:
+            self._cache.pop(user_id)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+class RedisUserBackend:
+    # Caché compartida por todos los workers en un servidor con protocolo Redis (redis-server, fakeredis...);
+    # un fallo de Redis se trata como un fallo de caché, nunca como un error de la petición
+    name = "redis"
+    shared = True
+
+    def __init__(self, client, ttl: float, prefix: str = "user:"):
+        from redis.exceptions import RedisError
+
+        self.client = client
+        self.ttl_ms = int(ttl * 1000)
+        self.prefix = prefix
+        self._errors = (RedisError, OSError)
+        self.errors = 0
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    async def get_many(self, ids: Iterable[int]) -> Dict[int, dict]:
+        ids = list(ids)
+        try:
+            values = await self.client.mget([self._key(user_id) for user_id in ids])
+        except self._errors:
+            self.errors += 1
+            return {}
+        return {user_id: orjson.loads(value) for user_id, value in zip(ids, values) if value is not None}
+
+    async def set_many(self, records: Dict[int, dict]) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for user_id, record in records.items():
+            pipe.set(self._key(user_id), orjson.dumps(record), px=self.ttl_ms)
+        try:
+            await pipe.execute()
+        except self._errors:
+            self.errors += 1
+
+    async def delete_many(self, ids: Iterable[int]) -> None:
+        try:
+            await self.client.delete(*(self._key(user_id) for user_id in ids))
+        except self._errors:
+            self.errors += 1
+
+    async def clear(self) -> None:
+        # Compartida: las entradas de otros workers no se tocan al reconectar
+        pass
+
+    def __len__(self) -> int:
+        return 0
+
+class UserCache:
+    # Caché de registros de usuario (UserOut + version) delante de SQLite.
+    # Tras cada escritura confirmada se borra la entrada y se publica la invalidación en `channel`;
+    # los demás workers la aplican al recibirla. El TTL acota lo que dure una entrada si se pierde un mensaje.
+    def __init__(self, backend, client=None, channel: str = "user-cache-invalidations", ttl: float = 5.0, maxsize: int = 100000):
+        self.backend = backend
+        self.client = client  # Conexión Redis para pub/sub; None: las invalidaciones solo llegan a este proceso
+        self.channel = channel
+        self._origin = uuid.uuid4().hex
+        self._sequence = 0
+        # Id -> secuencia de su última invalidación, para no guardar lecturas que la precedieron
+        self._invalidated = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._listeners: List[Callable[[List[int]], None]] = []
+        self._task: Optional[asyncio.Task] = None
+        self._subscribed = asyncio.Event()
+        self.hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.stale_sets_skipped = 0
+        self.invalidations_sent = 0
+        self.invalidations_received = 0
+        self.publish_errors = 0
+
+    def on_invalidate(self, callback: Callable[[List[int]], None]) -> None:
+        # Otras cachés por usuario (p. ej. token_version) se invalidan con el mismo mensaje
+        self._listeners.append(callback)
+
+    def begin_read(self) -> int:
+        return self._sequence
+
+    async def get_many(self, ids: List[int]) -> Dict[int, dict]:
+        found = await self.backend.get_many(ids)
+        self.hits += len(found)
+        self.misses += len(ids) - len(found)
+        return found
+
+    async def set_many(self, records: Dict[int, dict], since: int) -> None:
+        # Una invalidación posterior a begin_read() gana: la fila leída puede ser anterior a la escritura
+        fresh = {user_id: record for user_id, record in records.items() if self._invalidated.get(user_id, -1) <= since}
+        self.stale_sets_skipped += len(records) - len(fresh)
+        if fresh:
+            await self.backend.set_many(fresh)
+            self.sets += len(fresh)
+
+    async def _forget(self, ids: List[int], delete: bool) -> None:
+        self._sequence += 1
+        for user_id in ids:
+            self._invalidated.set(user_id, self._sequence)
+        if delete:
+            await self.backend.delete_many(ids)
+        for callback in self._listeners:
+            callback(ids)
+
+    async def invalidate(self, ids: List[int]) -> None:
+        # Llamar después del commit
+        await self._forget(ids, delete=True)
+        self.invalidations_sent += 1
+        if self.client is None:
+            return
+        message = orjson.dumps({"ids": ids, "at": time.time(), "origin": self._origin})
+        try:
+            await self.client.publish(self.channel, message)
+        except Exception:
+            # Sin broadcast los demás workers convergen al caducar el TTL
+            self.publish_errors += 1
+            logger.exception("User cache invalidation could not be published")
+
+    async def start(self) -> None:
+        if self.client is None or self._task is not None:
+            return
+        # Origen nuevo por proceso: los workers creados con fork no comparten el del padre
+        self._origin = uuid.uuid4().hex
+        self._subscribed = asyncio.Event()
+        self._task = asyncio.create_task(self._listen())
+        await self._subscribed.wait()
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self) -> None:
+        reconnecting = False
+        while True:
+            pubsub = self.client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                if reconnecting:
+                    # Mientras no había suscripción se han podido perder invalidaciones
+                    await self.backend.clear()
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    payload = orjson.loads(message["data"])
+                    if payload["origin"] == self._origin:
+                        continue
+                    INVALIDATION_LAG.observe(max(0.0, time.time() - payload["at"]))
+                    self.invalidations_received += 1
+                    # En el backend compartido el borrado ya lo hizo el emisor
+                    await self._forget(payload["ids"], delete=not self.backend.shared)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("User cache invalidation subscription failed, reconnecting")
+                self._subscribed.set()
+                reconnecting = True
+                await asyncio.sleep(1.0)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "size": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "sets": self.sets,
+            "stale_sets_skipped": self.stale_sets_skipped,
+            "invalidations_sent": self.invalidations_sent,
+            "invalidations_received": self.invalidations_received,
+            "publish_errors": self.publish_errors,
+            "backend_errors": self.backend.errors,
+        }
+
+def create_user_cache() -> UserCache:
+    client = None
+    if settings.USER_CACHE_REDIS_URL:
+        # Dependencia opcional: solo se importa si se configura Redis
+        import redis.asyncio as redis
+
+        client = redis.from_url(settings.USER_CACHE_REDIS_URL)
+    if settings.USER_CACHE_BACKEND == "redis":
+        if client is None:
+            raise ValueError("USER_CACHE_BACKEND=redis requires USER_CACHE_REDIS_URL")
+        backend = RedisUserBackend(client, ttl=settings.USER_CACHE_TTL_SECONDS)
+    elif settings.USER_CACHE_BACKEND == "local":
+        backend = LocalUserBackend(maxsize=settings.USER_CACHE_MAXSIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+    else:
+        raise ValueError(f"Unknown user cache backend: {settings.USER_CACHE_BACKEND}")
+    return UserCache(
+        backend,
+        client=client,
+        channel=settings.USER_CACHE_CHANNEL,
+        ttl=settings.USER_CACHE_TTL_SECONDS,
+        maxsize=settings.USER_CACHE_MAXSIZE,
+    )
+
+user_cache = create_user_cache()
@@ -1,14 +1,91 @@
-from sqlalchemy import create_engine
+import os
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from typing import Optional
 from ..core.config import settings
 
+# Drivers asíncronos equivalentes a los síncronos
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+def get_async_database_url(url: str) -> str:
+    # Derivar la URL asíncrona a partir de DATABASE_URL (sqlite:// -> sqlite+aiosqlite://)
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if parsed.drivername != backend or backend not in ASYNC_DRIVERS:
+        return url
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+def _pool_options(url: str, is_async: bool = False) -> dict:
+    # SQLite en memoria usa un pool de una sola conexión que no admite dimensionado
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+    return {
+        # Explícito: aiosqlite usaría NullPool (una conexión nueva por sesión)
+        "poolclass": AsyncAdaptedQueuePool if is_async else QueuePool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+def configure_sqlite(sync_engine: Engine, profile: str = "default") -> None:
+    # Pragmas aplicados a cada conexión nueva; el perfil de producción añade WAL y ajustes de caché
+    if sync_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # SQLite no aplica las FOREIGN KEY declaradas si no se activa por conexión
+        cursor.execute("PRAGMA foreign_keys=ON")
+        if profile == "production":
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+            cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+            cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+            cursor.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}")
+        cursor.close()
+
+def create_db_engine(url: Optional[str] = None, profile: Optional[str] = None) -> Engine:
+    url = url or settings.DATABASE_URL
+    connect_args = {"check_same_thread": False} if make_url(url).get_backend_name() == "sqlite" else {}
+    db_engine = create_engine(url, connect_args=connect_args, **_pool_options(url))
+    configure_sqlite(db_engine, profile or settings.DATABASE_PROFILE)
+    return db_engine
+
+def create_async_db_engine(url: Optional[str] = None, profile: Optional[str] = None) -> AsyncEngine:
+    url = url or settings.ASYNC_DATABASE_URL or get_async_database_url(settings.DATABASE_URL)
+    db_engine = create_async_engine(url, **_pool_options(url, is_async=True))
+    configure_sqlite(db_engine.sync_engine, profile or settings.DATABASE_PROFILE)
+    return db_engine
+
 # Crear el engine de SQLAlchemy
-engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_db_engine()
 
 # Crear una fábrica de sesiones
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Engine y fábrica de sesiones asíncronas (usados por los endpoints)
+async_engine = create_async_db_engine()
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def _dispose_pools_after_fork():
+    # Un worker creado con fork no debe reutilizar las conexiones del proceso padre: abre las suyas
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_dispose_pools_after_fork)
+
 # Base para los modelos
 Base = declarative_base()
 
@@ -18,4 +95,13 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Dependencia asíncrona para obtener la sesión de la base de datos
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+# Dependencia con la fábrica de sesiones, para respuestas en streaming que abren su propia sesión
+def get_async_sessionmaker() -> async_sessionmaker:
+    return AsyncSessionLocal
@@ -0,0 +1,172 @@
+from typing import Callable, Dict, Set
+from sqlalchemy import inspect, insert, select, update
+from sqlalchemy.engine import URL, Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+from .database import Base
+from ..models.audit_log import AUDIT_LOG_DDL
+from ..models.catalog_version import CatalogVersion
+from ..models.revoked_token import RevokedToken
+from ..models.role import Role  # noqa: F401
+from ..models.role_stat import ROLE_STATS_DDL, ROLE_STATS_REBUILD
+from ..models.user import USERS_FTS_DDL, User  # noqa: F401
+
+# Incrementar al añadir una migración
+SCHEMA_VERSION = 8
+SCHEMA_CATALOG_NAME = "schema"
+
+# URLs ya comprobadas en este proceso (los workers creados con fork lo heredan)
+_checked: Set[str] = set()
+
+def _url_key(url: URL) -> str:
+    # El engine síncrono y el asíncrono de la misma base comparten entrada
+    return url.set(drivername=url.get_backend_name()).render_as_string(hide_password=False)
+
+def _read_version(conn: Connection) -> int:
+    # SQLite guarda la versión en la cabecera del fichero; el resto de motores, en catalog_versions
+    if conn.dialect.name == "sqlite":
+        return conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if not inspect(conn).has_table(CatalogVersion.__tablename__):
+        return 0
+    return conn.scalar(select(CatalogVersion.version).where(CatalogVersion.name == SCHEMA_CATALOG_NAME)) or 0
+
+def _write_version(conn: Connection, version: int) -> None:
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql(f"PRAGMA user_version = {int(version)}")
+        return
+    result = conn.execute(
+        update(CatalogVersion).where(CatalogVersion.name == SCHEMA_CATALOG_NAME).values(version=version)
+    )
+    if result.rowcount == 0:
+        conn.execute(insert(CatalogVersion).values(name=SCHEMA_CATALOG_NAME, version=version))
+
+def _columns(conn: Connection, table: str) -> Set[str]:
+    return {column["name"] for column in inspect(conn).get_columns(table)}
+
+# Migraciones idempotentes: también se aplican sobre bases creadas por create_all sin versión
+def _create_tables(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+    # create_all no añade índices nuevos a tablas que ya existían
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+def _add_row_versions(conn: Connection) -> None:
+    for table in ("users", "roles"):
+        if "version" not in _columns(conn, table):
+            conn.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
+def _add_user_search(conn: Connection) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    exists = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'users_fts'").first() is not None
+    for statement in USERS_FTS_DDL:
+        conn.exec_driver_sql(statement)
+    if not exists:
+        conn.exec_driver_sql("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+
+def _add_role_stats(conn: Connection) -> None:
+    if conn.dialect.name != "sqlite":
+        return
+    Base.metadata.create_all(bind=conn)
+    for statement in ROLE_STATS_DDL:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql(ROLE_STATS_REBUILD)
+
+def _add_token_versions(conn: Connection) -> None:
+    if "token_version" not in _columns(conn, "users"):
+        conn.exec_driver_sql("ALTER TABLE users ADD COLUMN token_version INTEGER NOT NULL DEFAULT 1")
+
+def _add_audit_log(conn: Connection) -> None:
+    Base.metadata.create_all(bind=conn)
+    if conn.dialect.name == "sqlite":
+        for statement in AUDIT_LOG_DDL:
+            conn.exec_driver_sql(statement)
+
+def _rebuild_with_autoincrement(conn: Connection, table) -> bool:
+    # SQLite no admite añadir AUTOINCREMENT con ALTER TABLE: se reconstruye la tabla.
+    # Devuelve True si la ha reconstruido (sus triggers se han eliminado y hay que recrearlos)
+    if conn.dialect.name != "sqlite":
+        return False
+    name = table.name
+    sql = conn.exec_driver_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)).scalar()
+    if "AUTOINCREMENT" in sql.upper():
+        return False
+    triggers = [trigger for (trigger,) in conn.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = ?", (name,)
+    )]
+    for trigger in triggers:
+        conn.exec_driver_sql(f"DROP TRIGGER {trigger}")
+    conn.exec_driver_sql(f"ALTER TABLE {name} RENAME TO {name}_old")
+    # Los índices viajan con la tabla renombrada: se liberan sus nombres para la nueva
+    for index in conn.exec_driver_sql(f"PRAGMA index_list({name}_old)").mappings().all():
+        if index["origin"] == "c":
+            conn.exec_driver_sql(f"DROP INDEX {index['name']}")
+    table.create(bind=conn)
+    columns = ", ".join(column.name for column in table.columns)
+    conn.exec_driver_sql(f"INSERT INTO {name} ({columns}) SELECT {columns} FROM {name}_old")
+    conn.exec_driver_sql(f"DROP TABLE {name}_old")
+    return True
+
+def _add_users_autoincrement(conn: Connection) -> None:
+    if not _rebuild_with_autoincrement(conn, User.__table__):
+        return
+    # create() ya ha añadido los triggers de búsqueda; faltan los contadores por rol
+    conn.exec_driver_sql("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+    for statement in ROLE_STATS_DDL:
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql(ROLE_STATS_REBUILD)
+
+def _add_revoked_tokens_autoincrement(conn: Connection) -> None:
+    # Los workers sincronizan por id creciente: un id reutilizado tras la purga no lo verían nunca
+    _rebuild_with_autoincrement(conn, RevokedToken.__table__)
+
+# Triggers de inserción en users que la carga masiva de init_db suspende y sustituye por una única
+# reconstrucción al final: (tabla mantenida, trigger, DDL del trigger, reconstrucción)
+BULK_LOAD_TRIGGERS = (
+    ("users_fts", "users_fts_ai", USERS_FTS_DDL[1], "INSERT INTO users_fts(users_fts) VALUES ('rebuild')"),
+    ("role_stats", "role_stats_user_ai", ROLE_STATS_DDL[1], ROLE_STATS_REBUILD),
+)
+
+def _restore_bulk_load_triggers(conn: Connection) -> None:
+    # Una carga masiva interrumpida (kill, OOM, corte de luz) deja los triggers sin recrear con el esquema
+    # ya en la versión actual: se reconstruye la tabla mantenida y se vuelve a crear el trigger
+    if conn.dialect.name != "sqlite":
+        return
+    existing = {name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+    for table, trigger, create_trigger, rebuild in BULK_LOAD_TRIGGERS:
+        if table in existing and trigger not in existing:
+            conn.exec_driver_sql(rebuild)
+            conn.exec_driver_sql(create_trigger)
+
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {
+    1: _create_tables,
+    2: _add_row_versions,
+    3: _add_user_search,
+    4: _add_role_stats,
+    5: _add_token_versions,
+    6: _add_audit_log,
+    7: _add_users_autoincrement,
+    8: _add_revoked_tokens_autoincrement,
+}
+
+def ensure_schema(conn: Connection) -> bool:
+    # Devuelve True si ha aplicado migraciones; con la versión al día solo cuesta una lectura
+    key = _url_key(conn.engine.url)
+    if key in _checked:
+        return False
+    current = _read_version(conn)
+    if current > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {current} is newer than this code ({SCHEMA_VERSION})")
+    for version in range(current + 1, SCHEMA_VERSION + 1):
+        MIGRATIONS[version](conn)
+    if current != SCHEMA_VERSION:
+        _write_version(conn, SCHEMA_VERSION)
+    _restore_bulk_load_triggers(conn)
+    _checked.add(key)
+    return current != SCHEMA_VERSION
+
+async def ensure_schema_async(db_engine: AsyncEngine) -> bool:
+    if _url_key(db_engine.url) in _checked:
+        return False
+    async with db_engine.begin() as conn:
+        return await conn.run_sync(ensure_schema)
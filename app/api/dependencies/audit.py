@@ -0,0 +1,9 @@
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from ..core.audit import AuditWriter, audit_writer
+from ..database.database import get_async_sessionmaker
+
+async def get_audit_writer(sessionmaker: async_sessionmaker = Depends(get_async_sessionmaker)) -> AuditWriter:
+    # El lifespan lo arranca al iniciar; aquí se arranca de forma perezosa si la app corre sin lifespan
+    audit_writer.start(sessionmaker)
+    return audit_writer
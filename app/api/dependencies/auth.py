@@ -1,15 +1,68 @@
+from typing import Iterable, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.cache import TTLCache
+from ..core.config import settings
+from ..core.revocation import revocation_store
+from ..core.role_catalog import role_catalog
 from ..core.security import decode_access_token
-from ..schemas.auth import TokenData
+from ..core.user_cache import user_cache
+from ..database.database import get_async_db
+from ..models.user import User
+from ..schemas.auth import CurrentUser
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> TokenData:
+# Caché por uid de (token_version, username) vigentes; el resto del principal viaja en el token
+token_version_cache = TTLCache(
+    maxsize=settings.TOKEN_VERSION_CACHE_MAXSIZE,
+    ttl=settings.TOKEN_VERSION_CACHE_TTL_SECONDS,
+)
+
+def invalidate_token_version(user_ids: Iterable[int]) -> None:
+    # Se ejecuta con cada invalidación de la caché de usuarios, también las recibidas por pub/sub
+    # de otros workers; sin Redis, el resto de workers lo ve al caducar su entrada
+    for user_id in user_ids:
+        token_version_cache.pop(user_id)
+
+user_cache.on_invalidate(invalidate_token_version)
+
+async def current_token_version(db: AsyncSession, user_id: int) -> Optional[Tuple[int, str]]:
+    # (token_version, username) de la fila; None si el usuario ya no existe
+    state = token_version_cache.get(user_id)
+    if state is None:
+        row = (await db.execute(select(User.token_version, User.username).where(User.id == user_id))).first()
+        if row is not None:
+            state = tuple(row)
+            token_version_cache.set(user_id, state)
+    return state
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     payload = decode_access_token(token)
-    return TokenData(username=payload["username"])
\ No newline at end of file
+    # Denylist en memoria (Bloom + set), sincronizada periódicamente con la base de datos
+    await revocation_store.sync(db)
+    if revocation_store.is_revoked(payload["jti"]):
+        raise credentials_exception
+    
+    # Un cambio de rol o contraseña, o el borrado del usuario, invalida los tokens anteriores.
+    # El username también se compara: un token nunca vale para otra fila con el mismo id
+    if await current_token_version(db, payload["uid"]) != (payload["tv"], payload["username"]):
+        raise credentials_exception
+    
+    # Principal desde los claims; nombre del rol y permiso de admin desde el catálogo en memoria
+    roles = await role_catalog.refresh_if_stale(db)
+    role_id = payload["role_id"]
+    return CurrentUser(
+        id=payload["uid"],
+        username=payload["username"],
+        role_id=role_id,
+        role_name=roles.by_id.get(role_id, payload["role"]),
+        is_admin=roles.is_admin(role_id),
+    )
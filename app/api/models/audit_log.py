@@ -0,0 +1,29 @@
+from sqlalchemy import DDL, JSON, Column, Float, Index, Integer, String, event
+from ..database.database import Base
+
+class AuditLog(Base):
+    __tablename__ = "audit_log"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(Float, nullable=False)  # Epoch en segundos del momento de la mutación
+    actor_id = Column(Integer, index=True)  # Usuario autenticado; None en el registro público
+    action = Column(String, nullable=False)  # create, update, delete
+    entity_type = Column(String, nullable=False)  # user, role
+    entity_id = Column(Integer)
+    details = Column(JSON)  # Campos modificados (nunca contraseñas ni hashes)
+
+    __table_args__ = (
+        # Historial de una entidad, del más reciente al más antiguo
+        Index("ix_audit_log_entity", "entity_type", "entity_id", "id"),
+    )
+
+# Tabla de solo inserción: UPDATE y DELETE se rechazan en la propia base de datos (solo SQLite)
+AUDIT_LOG_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS audit_log_no_update BEFORE UPDATE ON audit_log BEGIN "
+    "SELECT RAISE(ABORT, 'audit_log is append-only'); END",
+    "CREATE TRIGGER IF NOT EXISTS audit_log_no_delete BEFORE DELETE ON audit_log BEGIN "
+    "SELECT RAISE(ABORT, 'audit_log is append-only'); END",
+)
+
+for statement in AUDIT_LOG_DDL:
+    event.listen(AuditLog.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
@@ -0,0 +1,8 @@
+from sqlalchemy import Column, Integer, String
+from ..database.database import Base
+
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)  # Ejemplo: roles
+    version = Column(Integer, nullable=False, default=0)
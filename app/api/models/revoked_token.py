@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String
+from ..database.database import Base
+
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String, unique=True, index=True, nullable=False)
+    expires_at = Column(Integer, index=True, nullable=False)  # Epoch en segundos (exp del token)
+
+    # AUTOINCREMENT: los workers leen las filas con id > último visto, un id nunca se reutiliza
+    __table_args__ = {"sqlite_autoincrement": True}
@@ -5,4 +5,8 @@ class Role(Base):
     __tablename__ = "roles"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True, index=True, nullable=False)  # Ejemplo: admin, editor, viewer
\ No newline at end of file
+    name = Column(String, unique=True, index=True, nullable=False)  # Ejemplo: admin, editor, viewer
+    # Versión de la fila: ETag y control de concurrencia optimista
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
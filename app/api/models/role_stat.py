@@ -0,0 +1,40 @@
+from sqlalchemy import DDL, Column, Integer, ForeignKey, event
+from ..database.database import Base
+from .user import User
+
+class RoleStat(Base):
+    __tablename__ = "role_stats"
+
+    role_id = Column(Integer, ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True)
+    user_count = Column(Integer, nullable=False, default=0)  # Usuarios con este rol
+
+# Contadores mantenidos por triggers en la misma transacción que la escritura,
+# sea cual sea el camino (endpoints, importación masiva, init_db, ORM). Solo SQLite:
+# en otros motores la tabla existe pero no se mantiene (ver role_stats_maintained).
+ROLE_STATS_DDL = (
+    "CREATE TRIGGER IF NOT EXISTS role_stats_role_ai AFTER INSERT ON roles BEGIN "
+    "INSERT OR IGNORE INTO role_stats(role_id, user_count) VALUES (new.id, 0); END",
+    "CREATE TRIGGER IF NOT EXISTS role_stats_user_ai AFTER INSERT ON users BEGIN "
+    "UPDATE role_stats SET user_count = user_count + 1 WHERE role_id = new.role_id; END",
+    "CREATE TRIGGER IF NOT EXISTS role_stats_user_ad AFTER DELETE ON users BEGIN "
+    "UPDATE role_stats SET user_count = user_count - 1 WHERE role_id = old.role_id; END",
+    "CREATE TRIGGER IF NOT EXISTS role_stats_user_au AFTER UPDATE OF role_id ON users "
+    "WHEN old.role_id IS NOT new.role_id BEGIN "
+    "UPDATE role_stats SET user_count = user_count - 1 WHERE role_id = old.role_id; "
+    "UPDATE role_stats SET user_count = user_count + 1 WHERE role_id = new.role_id; END",
+)
+
+# Recalcula los contadores desde cero (migraciones y cargas masivas sin triggers)
+ROLE_STATS_REBUILD = (
+    "INSERT OR REPLACE INTO role_stats(role_id, user_count) "
+    "SELECT roles.id, COUNT(users.id) FROM roles LEFT JOIN users ON users.role_id = roles.id GROUP BY roles.id"
+)
+
+# Los triggers se crean cuando ya existen users y roles
+RoleStat.__table__.add_is_dependent_on(User.__table__)
+for statement in ROLE_STATS_DDL:
+    event.listen(RoleStat.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+def role_stats_maintained(dialect_name: str) -> bool:
+    # Igual que el índice FTS: sin triggers, los lectores cuentan directamente sobre users
+    return dialect_name == "sqlite"
@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import DDL, Column, Float, Integer, String, ForeignKey, column, event, table
 from sqlalchemy.orm import relationship
 from ..database.database import Base
+from .role import Role
 
 class User(Base):
     __tablename__ = "users"
@@ -9,8 +10,38 @@ class User(Base):
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
-    role_id = Column(Integer, ForeignKey("roles.id"), nullable=False)
+    role_id = Column(Integer, ForeignKey("roles.id"), index=True, nullable=False)
+    # Versión de la fila: ETag y control de concurrencia optimista
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Se incrementa al cambiar rol o contraseña: invalida los tokens emitidos antes
+    token_version = Column(Integer, nullable=False, default=1, server_default="1")
 
-    role = relationship("Role", back_populates="users")
+    __mapper_args__ = {"version_id_col": version}
+    # AUTOINCREMENT: SQLite no reutiliza el id de un usuario borrado (los tokens se atan al uid)
+    __table_args__ = {"sqlite_autoincrement": True}
 
-Role.users = relationship("User", back_populates="role")
\ No newline at end of file
+    # Las lecturas hacen JOIN explícito (expand=role); una carga perezosa por fila sería un N+1
+    role = relationship("Role", back_populates="users", lazy="raise_on_sql")
+
+# passive_deletes: borrar un rol no carga sus usuarios (delete_role ya comprueba el contador)
+Role.users = relationship("User", back_populates="role", passive_deletes=True)
+
+# Índice FTS5 (trigram) sobre username y email, sincronizado con triggers.
+# Solo SQLite: se crea tras la tabla users y se elimina antes que ella.
+users_fts = table("users_fts", column("rowid", Integer), column("rank", Float), column("users_fts", String))
+
+USERS_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "username, email, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, username, email) VALUES (new.id, new.username, new.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, username, email) VALUES ('delete', old.id, old.username, old.email); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username, email ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, username, email) VALUES ('delete', old.id, old.username, old.email); "
+    "INSERT INTO users_fts(rowid, username, email) VALUES (new.id, new.username, new.email); END",
+)
+
+for statement in USERS_FTS_DDL:
+    event.listen(User.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(User.__table__, "before_drop", DDL("DROP TABLE IF EXISTS users_fts").execute_if(dialect="sqlite"))
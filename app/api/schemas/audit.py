@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+class AuditLogOut(BaseModel):
+    id: int
+    created_at: float  # Epoch en segundos
+    actor_id: Optional[int] = None
+    action: str
+    entity_type: str
+    entity_id: Optional[int] = None
+    details: Optional[Dict[str, Any]] = None
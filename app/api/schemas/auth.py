@@ -1,12 +1,30 @@
 from pydantic import BaseModel, constr
+from typing import Optional
 
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None  # Revocar también el refresh token de la sesión
 
 class TokenData(BaseModel):
     username: str | None = None
 
 class Login(BaseModel):
     username: constr(min_length=3, max_length=50)
-    password: constr(min_length=8)
\ No newline at end of file
+    password: constr(min_length=8)
+class CurrentUser(BaseModel):
+    # Principal resuelto una vez por petición (usuario + rol)
+    id: int
+    username: str
+    role_id: int
+    role_name: str
+    is_admin: bool
+
+    class Config:
+        frozen = True
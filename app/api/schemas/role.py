@@ -14,4 +14,9 @@ class RoleOut(RoleBase):
     id: int
 
     class Config:
-        from_attributes = True  # Permite mapear desde objetos SQLAlchemy
\ No newline at end of file
+        from_attributes = True  # Permite mapear desde objetos SQLAlchemy
+
+class RoleStatsOut(BaseModel):
+    role_id: int
+    name: str
+    user_count: int  # Mantenido por triggers, sin COUNT(*) sobre users
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, EmailStr, constr
-from typing import Optional
+from typing import List, Literal, Optional
+from .role import RoleOut
 
 class UserBase(BaseModel):
     username: constr(min_length=3, max_length=50)  # Username entre 3 y 50 caracteres
@@ -19,4 +20,16 @@ class UserOut(UserBase):
     id: int
 
     class Config:
-        from_attributes = True  # Permite mapear desde objetos SQLAlchemy
\ No newline at end of file
+        from_attributes = True  # Permite mapear desde objetos SQLAlchemy
+
+class UserWithRoleOut(UserOut):
+    role: RoleOut  # Incluido con expand=role
+
+class UserBulkResult(BaseModel):
+    index: int  # Posición de la fila en la entrada
+    status: Literal["created", "error"]
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class UserBatchRequest(BaseModel):
+    ids: List[int]  # Ids a resolver; el resultado va indexado por id (null si no existe)
@@ -1,10 +1,14 @@
 import pytest
 from fastapi import FastAPI
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from api.database.database import Base, get_db
+from sqlalchemy.pool import NullPool
+from api.database.database import Base, configure_sqlite, get_db, get_async_db, get_async_sessionmaker
 from api.models.user import User
 from api.models.role import Role
+from api.core.audit import audit_writer
+from api.core.rate_limit import login_throttle
 from api.core.security import get_password_hash
 from app.main import app
 from httpx import AsyncClient
@@ -12,10 +16,19 @@ from typing import Generator
 
 # Configuración de la base de datos de prueba
 TEST_DATABASE_URL = "sqlite:///./test.db"
+TEST_ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
 
 @pytest.fixture(scope="session")
 def test_engine():
     engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
+    configure_sqlite(engine)
+    return engine
+
+@pytest.fixture(scope="session")
+def test_async_engine():
+    # NullPool: cada test corre en su propio event loop
+    engine = create_async_engine(TEST_ASYNC_DATABASE_URL, poolclass=NullPool)
+    configure_sqlite(engine.sync_engine)
     return engine
 
 @pytest.fixture(scope="session")
@@ -31,6 +44,7 @@ def test_db(test_engine):
         for role_name in roles:
             if not db.query(Role).filter(Role.name == role_name).first():
                 db.add(Role(name=role_name))
+        db.flush()
         
         # Crear usuario admin
         if not db.query(User).filter(User.username == "admin").first():
@@ -66,11 +80,28 @@ def override_get_db(db_session):
     return _override_get_db
 
 @pytest.fixture
-async def client(override_get_db):
-    # Sobrescribir la dependencia get_db para usar la base de datos de prueba
+def testing_async_sessionmaker(test_db, test_async_engine):
+    return async_sessionmaker(test_async_engine, autoflush=False, expire_on_commit=False)
+
+@pytest.fixture
+def override_get_async_db(testing_async_sessionmaker):
+    async def _override_get_async_db():
+        async with testing_async_sessionmaker() as db:
+            yield db
+    return _override_get_async_db
+
+@pytest.fixture
+async def client(override_get_db, override_get_async_db, testing_async_sessionmaker):
+    # Sobrescribir las dependencias de sesión para usar la base de datos de prueba
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_async_sessionmaker] = lambda: testing_async_sessionmaker
+    # Cada test empieza sin intentos de login acumulados
+    login_throttle.clear()
     async with AsyncClient(app=app, base_url="http://test") as client:
         yield client
+    # Sin lifespan en los tests: volcar la auditoría antes de que se cierre el event loop del test
+    await audit_writer.stop()
     app.dependency_overrides.clear()
 
 @pytest.fixture
@@ -0,0 +1,117 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from api.core.audit import AuditWriter
+
+@pytest.mark.asyncio
+async def test_role_mutations_are_audited(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.post("/api/v1/roles/", json={"name": "auditedrole"}, headers=headers)
+    role_id = response.json()["id"]
+    await client.put(f"/api/v1/roles/{role_id}", json={"name": "auditedrole2"}, headers=headers)
+    await client.delete(f"/api/v1/roles/{role_id}", headers=headers)
+
+    # Del más reciente al más antiguo, con el admin como actor
+    response = await client.get(
+        "/api/v1/audit/",
+        params={"entity_type": "role", "entity_id": role_id},
+        headers=headers
+    )
+    assert response.status_code == 200
+    events = response.json()
+    assert [event["action"] for event in events] == ["delete", "update", "create"]
+    assert {event["actor_id"] for event in events} == {1}
+    assert events[1]["details"] == {"name": "auditedrole2", "previous_name": "auditedrole"}
+
+    # Paginación keyset con el cursor de la cabecera
+    response = await client.get(
+        "/api/v1/audit/",
+        params={"entity_type": "role", "entity_id": role_id, "limit": 2},
+        headers=headers
+    )
+    assert [event["action"] for event in response.json()] == ["delete", "update"]
+    response = await client.get(
+        "/api/v1/audit/",
+        params={"entity_type": "role", "entity_id": role_id, "limit": 2, "cursor": response.headers["X-Next-Cursor"]},
+        headers=headers
+    )
+    assert [event["action"] for event in response.json()] == ["create"]
+
+@pytest.mark.asyncio
+async def test_user_update_audit_omits_password(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.post("/api/v1/users/", json={
+        "username": "audituser",
+        "email": "audituser@example.com",
+        "password": "testpassword",
+        "role_id": 3
+    })
+    user_id = response.json()["id"]
+    await client.put(f"/api/v1/users/{user_id}", json={"email": "audit2@example.com", "password": "newpassword"}, headers=headers)
+
+    response = await client.get("/api/v1/audit/", params={"entity_type": "user", "entity_id": user_id}, headers=headers)
+    update, create = response.json()
+    assert create["action"] == "create" and create["actor_id"] is None
+    assert update["details"] == {"fields": ["email", "password"]}
+    assert "newpassword" not in response.text
+
+    # Solo admin
+    response = await client.post("/api/v1/auth/login", json={"username": "audituser", "password": "newpassword"})
+    response = await client.get("/api/v1/audit/", headers={"Authorization": f"Bearer {response.json()['access_token']}"})
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_audit_writer_batches_and_is_append_only(testing_async_sessionmaker):
+    writer = AuditWriter(maxsize=2, batch_size=3, flush_interval=0.01, retry_max=0.1)
+    writer.start(testing_async_sessionmaker)
+    # Cola de 2: los siguientes eventos esperan hueco (backpressure) en lugar de perderse
+    for i in range(7):
+        await writer.record("update", "test", i)
+    await writer.stop()
+    assert writer.written == 7
+    assert writer.blocked > 0
+    assert writer.batches < 7
+
+    async with testing_async_sessionmaker() as db:
+        assert await db.scalar(text("SELECT COUNT(*) FROM audit_log WHERE entity_type = 'test'")) == 7
+        with pytest.raises(IntegrityError):
+            await db.execute(text("DELETE FROM audit_log WHERE entity_type = 'test'"))
+
+@pytest.mark.asyncio
+async def test_audit_writer_dead_letters_bad_events(testing_async_sessionmaker):
+    writer = AuditWriter(maxsize=10, batch_size=10, flush_interval=0.01, retry_max=0.1)
+    writer.start(testing_async_sessionmaker)
+    await writer.record("update", "deadletter", 1)
+    await writer.record(None, "deadletter", 2)  # Viola NOT NULL: error permanente, no se reintenta
+    await writer.record("update", "deadletter", 3)
+    assert await writer.flush(timeout=5) is True
+    await writer.stop()
+    assert writer.written == 2
+    assert writer.dead_lettered == 1
+
+    async with testing_async_sessionmaker() as db:
+        assert await db.scalar(text("SELECT COUNT(*) FROM audit_log WHERE entity_type = 'deadletter'")) == 2
+
+@pytest.mark.asyncio
+async def test_audit_flush_is_bounded_while_the_database_is_locked():
+    class LockedSession:
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def execute(self, statement):
+            raise OperationalError("INSERT INTO audit_log", {}, Exception("database is locked"))
+
+    writer = AuditWriter(maxsize=10, batch_size=10, flush_interval=0, retry_max=0.05, retries=3)
+    writer.start(LockedSession)
+    await writer.record("update", "locked", 1)
+    # La espera de GET /audit está acotada aunque el escritor siga reintentando
+    assert await writer.flush(timeout=0.05) is False
+    # Agotados los reintentos, el lote se descarta y el escritor sigue vivo
+    assert await writer.flush(timeout=5) is True
+    assert writer.dead_lettered == 1
+    assert writer.write_errors == 4
+    await writer.stop()
@@ -1,5 +1,12 @@
+import asyncio
+import time
 import pytest
 from httpx import AsyncClient
+from api.core.config import settings
+from api.core.hashing import hashing_pool
+from api.core.rate_limit import LoginThrottle, TokenBucketLimiter
+from api.core.revocation import RevocationStore
+from api.core.security import create_access_token, decode_access_token, token_cache, token_claims
 
 @pytest.mark.asyncio
 async def test_login_success(client: AsyncClient):
@@ -29,3 +36,112 @@ async def test_login_nonexistent_user(client: AsyncClient):
     assert response.status_code == 401
     assert response.json()["detail"] == "Incorrect username or password"
 
+@pytest.mark.asyncio
+async def test_login_uses_hashing_pool(client: AsyncClient):
+    completed = hashing_pool.stats()["completed"]
+    response = await client.post("/api/v1/auth/login", json={
+        "username": "admin",
+        "password": "adminpassword"
+    })
+    assert response.status_code == 200
+    stats = hashing_pool.stats()
+    assert stats["completed"] == completed + 1
+    assert stats["in_flight"] == 0
+    assert stats["wait_seconds_total"] >= 0
+
+def test_decode_access_token_is_cached():
+    token = create_access_token(data=token_claims(99, "cacheduser", 3, "viewer", 1))
+    hits = token_cache.hits
+    assert decode_access_token(token)["username"] == "cacheduser"
+    assert decode_access_token(token)["username"] == "cacheduser"
+    assert token_cache.hits == hits + 1
+
+@pytest.mark.asyncio
+async def test_refresh_and_logout(client: AsyncClient):
+    response = await client.post("/api/v1/auth/login", json={
+        "username": "admin",
+        "password": "adminpassword"
+    })
+    tokens = response.json()
+    assert tokens["refresh_token"]
+
+    # Renovar con el refresh token (rotación)
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    renewed = response.json()
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+    # Un access token no sirve como refresh token
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": renewed["access_token"]})
+    assert response.status_code == 401
+
+    headers = {"Authorization": f"Bearer {renewed['access_token']}"}
+    response = await client.post("/api/v1/auth/logout", json={"refresh_token": renewed["refresh_token"]}, headers=headers)
+    assert response.status_code == 204
+    response = await client.get("/api/v1/users/", headers=headers)
+    assert response.status_code == 401
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": renewed["refresh_token"]})
+    assert response.status_code == 401
+
+@pytest.mark.asyncio
+async def test_concurrent_refresh_with_one_token_succeeds_once(client: AsyncClient):
+    response = await client.post("/api/v1/auth/login", json={"username": "admin", "password": "adminpassword"})
+    refresh_token = response.json()["refresh_token"]
+    
+    # Todas pasan la comprobación de la denylist antes de que ninguna revoque el token
+    responses = await asyncio.gather(*(
+        client.post("/api/v1/auth/refresh", json={"refresh_token": refresh_token}) for _ in range(5)
+    ))
+    assert sorted(response.status_code for response in responses) == [200, 401, 401, 401, 401]
+
+@pytest.mark.asyncio
+async def test_revocation_after_purge_reaches_other_workers(testing_async_sessionmaker):
+    # Dos workers: A revoca, B solo ve las filas con id mayor que la última que cargó
+    worker_a = RevocationStore(capacity=100, error_rate=0.01, sync_seconds=0)
+    worker_b = RevocationStore(capacity=100, error_rate=0.01, sync_seconds=0)
+    async with testing_async_sessionmaker() as db:
+        expires_at = int(time.time()) + 1
+        await worker_a.revoke(db, "jti-expiring", expires_at)
+        await worker_b.sync(db, force=True)
+        assert worker_b.is_revoked("jti-expiring")
+        
+        # La siguiente revocación purga la fila expirada, que era la de id más alto
+        await asyncio.sleep(max(0.0, expires_at - time.time()) + 0.05)
+        await worker_a.revoke(db, "jti-new", int(time.time()) + 60)
+        await worker_b.sync(db, force=True)
+        assert worker_b.is_revoked("jti-new")
+
+@pytest.mark.asyncio
+async def test_login_throttled(client: AsyncClient):
+    statuses = []
+    for _ in range(settings.LOGIN_USERNAME_BURST + 1):
+        response = await client.post("/api/v1/auth/login", json={
+            "username": "throttleduser",
+            "password": "somepassword"
+        })
+        statuses.append(response.status_code)
+    assert statuses[:-1] == [401] * settings.LOGIN_USERNAME_BURST
+    assert statuses[-1] == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+def test_ip_throttled_attempts_do_not_drain_username_bucket():
+    throttle = LoginThrottle()
+    throttle.by_ip = TokenBucketLimiter(rate_per_minute=1, burst=1, max_keys=100)
+    assert throttle.check("victim", "10.0.0.1") == 0
+    # La IP del atacante ya está limitada: sus intentos no gastan los tokens de "victim"
+    for _ in range(settings.LOGIN_USERNAME_BURST * 2):
+        assert throttle.check("victim", "10.0.0.1") > 0
+    assert throttle.check("victim", "10.0.0.2") == 0
+
+def test_rate_limiter_rejects_zero_rate():
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(rate_per_minute=0, burst=5, max_keys=100)
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(client: AsyncClient):
+    await client.post("/api/v1/auth/login", json={"username": "admin", "password": "adminpassword"})
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert 'http_request_duration_seconds_count{method="POST",route="/api/v1/auth/login",status="200"}' in response.text
+    assert "password_hashing_completed" in response.text
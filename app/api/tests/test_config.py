@@ -0,0 +1,13 @@
+import pytest
+from pydantic import ValidationError
+from api.core.config import Settings
+
+@pytest.mark.parametrize("field, value", [("SQLITE_SYNCHRONOUS", "NORMALL"), ("SQLITE_TEMP_STORE", "RAM")])
+def test_unknown_sqlite_pragma_values_fail_at_startup(field, value):
+    # SQLite ignoraría el PRAGMA en silencio y se ejecutaría con otra durabilidad
+    with pytest.raises(ValidationError):
+        Settings(DATABASE_URL="sqlite:///./x.db", SECRET_KEY="x", **{field: value})
+
+def test_known_sqlite_pragma_values_are_accepted():
+    settings = Settings(DATABASE_URL="sqlite:///./x.db", SECRET_KEY="x", SQLITE_SYNCHRONOUS="FULL", SQLITE_TEMP_STORE="FILE")
+    assert (settings.SQLITE_SYNCHRONOUS, settings.SQLITE_TEMP_STORE) == ("FULL", "FILE")
@@ -0,0 +1,44 @@
+from sqlalchemy import func, select
+from app.api.database.database import create_db_engine
+from app.api.database.schema import BULK_LOAD_TRIGGERS, _checked, ensure_schema
+from app.api.models.user import User
+from app.init_db import init_db
+
+def test_init_db_seeds_users_idempotently(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'seed.db'}")
+    init_db(engine, users=250, batch_size=100)
+    with engine.connect() as conn:
+        admin = conn.execute(select(User.hashed_password, User.version).where(User.username == "admin")).one()
+    init_db(engine, users=300, batch_size=100)
+    with engine.connect() as conn:
+        # El admin existente no se vuelve a hashear ni a escribir
+        assert conn.execute(select(User.hashed_password, User.version).where(User.username == "admin")).one() == admin
+        assert conn.scalar(select(func.count()).select_from(User)) == 301
+        assert conn.scalar(select(User.username).where(User.username == "user299")) == "user299"
+    engine.dispose()
+
+def test_interrupted_seed_triggers_are_restored(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'interrupted.db'}")
+    init_db(engine)
+    # Estado que deja una carga masiva muerta a mitad: triggers suspendidos y filas ya confirmadas
+    with engine.begin() as conn:
+        for _, trigger, _, _ in BULK_LOAD_TRIGGERS:
+            conn.exec_driver_sql(f"DROP TRIGGER {trigger}")
+        conn.exec_driver_sql(
+            "INSERT INTO users (username, email, hashed_password, role_id) VALUES ('halfseeded', 'halfseeded@example.com', 'x', 3)"
+        )
+    
+    # Siguiente arranque: el esquema ya está en la versión actual, pero los triggers se recrean
+    _checked.clear()
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        triggers = {name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        assert {trigger for _, trigger, _, _ in BULK_LOAD_TRIGGERS} <= triggers
+        assert conn.exec_driver_sql("SELECT COUNT(*) FROM users_fts WHERE users_fts MATCH '\"halfseeded\"'").scalar() == 1
+        assert conn.exec_driver_sql("SELECT user_count FROM role_stats WHERE role_id = 3").scalar() == 1
+        # Y vuelven a mantener los datos fila a fila
+        conn.exec_driver_sql(
+            "INSERT INTO users (username, email, hashed_password, role_id) VALUES ('afterrepair', 'afterrepair@example.com', 'x', 3)"
+        )
+        assert conn.exec_driver_sql("SELECT user_count FROM role_stats WHERE role_id = 3").scalar() == 2
+    engine.dispose()
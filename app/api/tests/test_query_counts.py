@@ -0,0 +1,111 @@
+import pytest
+from contextlib import contextmanager
+from httpx import AsyncClient
+from sqlalchemy import event
+from api.core.metrics import request_timings
+from api.core.revocation import revocation_store
+from api.core.role_catalog import role_catalog
+from api.dependencies.auth import token_version_cache
+
+@pytest.fixture
+def count_statements(test_async_engine, monkeypatch):
+    # Cachés de autenticación estables durante el test: ninguna sincronización periódica
+    # (catálogo de roles, denylist, token_version) puede colarse en los recuentos
+    monkeypatch.setattr(role_catalog, "sync_seconds", 3600)
+    monkeypatch.setattr(revocation_store, "sync_seconds", 3600)
+    monkeypatch.setattr(token_version_cache, "ttl", 3600)
+    token_version_cache.clear()
+
+    # Registra todas las sentencias SQL ejecutadas por peticiones HTTP durante el bloque
+    # (request_timings solo existe dentro de una petición: el escritor de auditoría queda fuera)
+    @contextmanager
+    def _count():
+        statements = []
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            if request_timings.get() is not None:
+                statements.append(statement)
+        event.listen(test_async_engine.sync_engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(test_async_engine.sync_engine, "before_cursor_execute", _record)
+    return _count
+
+@pytest.mark.asyncio
+async def test_write_endpoints_statement_counts(client: AsyncClient, admin_token: str, count_statements):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    # Calentar las cachés de token_version, denylist y catálogo de roles
+    await client.get("/api/v1/users/?limit=1", headers=headers)
+
+    with count_statements() as statements:
+        response = await client.post("/api/v1/users/", json={
+            "username": "testcountuser",
+            "email": "testcountuser@example.com",
+            "password": "testpassword",
+            "role_id": 3
+        })
+    assert response.status_code == 201
+    assert len(statements) == 1  # INSERT ... RETURNING
+    user_id = response.json()["id"]
+
+    with count_statements() as statements:
+        response = await client.post("/api/v1/users/", json={
+            "username": "testcountuser",
+            "email": "testcountother@example.com",
+            "password": "testpassword",
+            "role_id": 3
+        })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Username already registered"
+    assert len(statements) == 1
+
+    with count_statements() as statements:
+        response = await client.put(f"/api/v1/users/{user_id}", json={"email": "admin@example.com"}, headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Email already registered"
+    assert len(statements) == 1
+
+    with count_statements() as statements:
+        response = await client.put(f"/api/v1/users/{user_id}", json={"role_id": 2}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["role_id"] == 2
+    assert len(statements) == 1  # UPDATE ... RETURNING
+
+    with count_statements() as statements:
+        response = await client.delete(f"/api/v1/users/{user_id}", headers=headers)
+    assert response.status_code == 204
+    assert len(statements) == 1  # DELETE ... RETURNING
+
+    response = await client.put(f"/api/v1/users/{user_id}", json={"role_id": 2}, headers=headers)
+    assert response.status_code == 404
+
+@pytest.mark.asyncio
+async def test_expand_role_is_a_single_query(client: AsyncClient, admin_token: str, count_statements):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await client.get("/api/v1/users/?limit=1", headers=headers)
+    for i in range(3):
+        await client.post("/api/v1/users/", json={
+            "username": f"expanduser{i}",
+            "email": f"expanduser{i}@example.com",
+            "password": "testpassword",
+            "role_id": 2 + i % 2
+        })
+
+    with count_statements() as statements:
+        response = await client.get("/api/v1/users/", params={"expand": "role", "limit": 1000}, headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == 1  # SELECT ... JOIN roles, sin cargas por fila
+    users = response.json()
+    assert len(users) >= 4
+    assert all(user["role"]["id"] == user["role_id"] for user in users)
+    assert {"name": "admin", "id": 1} in [user["role"] for user in users]
+
+    user_id = users[-1]["id"]
+    with count_statements() as statements:
+        response = await client.get("/api/v1/users/batch", params={"ids": f"1,{user_id}", "expand": "role"}, headers=headers)
+    assert len(statements) == 1
+    assert response.json()["1"]["role"]["name"] == "admin"
+
+    response = await client.get(f"/api/v1/users/{user_id}", params={"expand": "role"}, headers=headers)
+    assert response.json()["role"]["name"] in ("editor", "viewer")
+    assert response.headers["ETag"].count("-") == 1
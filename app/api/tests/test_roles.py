@@ -1,7 +1,10 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 from api.models.role import Role
+from api.core.role_catalog import role_catalog
+from api.v1.endpoints import roles as roles_endpoints
 
 @pytest.mark.asyncio
 async def test_create_role(client: AsyncClient, admin_token: str):
@@ -94,3 +97,74 @@ async def test_delete_role_assigned(client: AsyncClient, admin_token: str, db_se
     assert response.status_code == 400
     assert response.json()["detail"] == "Cannot delete role assigned to users"
 
+@pytest.mark.asyncio
+async def test_role_catalog_swapped_on_write(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    await client.get("/api/v1/roles/", headers=headers)
+    version = role_catalog.snapshot.version
+
+    response = await client.post("/api/v1/roles/", json={"name": "catalogrole"}, headers=headers)
+    role_id = response.json()["id"]
+    assert role_catalog.snapshot.by_name["catalogrole"] == role_id
+    assert role_catalog.snapshot.version == version + 1
+
+    response = await client.put(f"/api/v1/roles/{role_id}", json={"name": "catalogrenamed"}, headers=headers)
+    assert role_catalog.snapshot.by_id[role_id] == "catalogrenamed"
+
+    response = await client.delete(f"/api/v1/roles/{role_id}", headers=headers)
+    assert role_id not in role_catalog.snapshot.by_id
+    assert role_catalog.snapshot.version == version + 3
+
+@pytest.mark.asyncio
+async def test_role_etag_and_if_match(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.post("/api/v1/roles/", json={"name": "etagrole"}, headers=headers)
+    role_id = response.json()["id"]
+
+    response = await client.get(f"/api/v1/roles/{role_id}", headers=headers)
+    etag = response.headers["ETag"]
+    response = await client.get(f"/api/v1/roles/{role_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    response = await client.put(f"/api/v1/roles/{role_id}", json={"name": "etagrole2"}, headers={**headers, "If-Match": etag})
+    assert response.status_code == 200
+    response = await client.put(f"/api/v1/roles/{role_id}", json={"name": "etagrole3"}, headers={**headers, "If-Match": etag})
+    assert response.status_code == 412
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("maintained", [True, False])
+async def test_role_stats_follow_user_writes(client: AsyncClient, admin_token: str, testing_async_sessionmaker, monkeypatch, maintained: bool):
+    # False: camino de los motores sin triggers (COUNT / EXISTS sobre users)
+    monkeypatch.setattr(roles_endpoints, "role_stats_maintained", lambda dialect_name: maintained)
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.post("/api/v1/roles/", json={"name": f"statsrole{int(maintained)}"}, headers=headers)
+    role_id = response.json()["id"]
+
+    async def user_count():
+        response = await client.get("/api/v1/roles/stats", headers=headers)
+        assert response.status_code == 200
+        return {stat["role_id"]: stat["user_count"] for stat in response.json()}[role_id]
+
+    assert await user_count() == 0
+    response = await client.post("/api/v1/users/", json={
+        "username": f"statsuser{int(maintained)}",
+        "email": f"statsuser{int(maintained)}@example.com",
+        "password": "testpassword",
+        "role_id": role_id
+    })
+    user_id = response.json()["id"]
+    if not maintained:
+        # Como en un motor sin triggers: el contador no se mantiene y no debe consultarse
+        async with testing_async_sessionmaker() as db:
+            await db.execute(text("UPDATE role_stats SET user_count = 0 WHERE role_id = :role_id"), {"role_id": role_id})
+            await db.commit()
+    assert await user_count() == 1
+
+    # El contador bloquea el borrado del rol mientras tenga usuarios
+    response = await client.delete(f"/api/v1/roles/{role_id}", headers=headers)
+    assert response.status_code == 400
+
+    await client.put(f"/api/v1/users/{user_id}", json={"role_id": 3}, headers=headers)
+    assert await user_count() == 0
+    response = await client.delete(f"/api/v1/roles/{role_id}", headers=headers)
+    assert response.status_code == 204
@@ -0,0 +1,32 @@
+from sqlalchemy import create_engine, inspect
+from app.api.database.schema import SCHEMA_VERSION, ensure_schema
+
+def test_ensure_schema_upgrades_legacy_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        # Esquema original, sin columnas version ni índice de búsqueda
+        conn.exec_driver_sql("CREATE TABLE roles (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE)")
+        conn.exec_driver_sql(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR NOT NULL UNIQUE, email VARCHAR NOT NULL UNIQUE, "
+            "hashed_password VARCHAR NOT NULL, role_id INTEGER NOT NULL REFERENCES roles(id))"
+        )
+        conn.exec_driver_sql("INSERT INTO roles (name) VALUES ('viewer')")
+        conn.exec_driver_sql("INSERT INTO users (username, email, hashed_password, role_id) VALUES ('legacy', 'legacy@example.com', 'x', 1)")
+    
+    with engine.begin() as conn:
+        assert ensure_schema(conn) is True
+        # La segunda comprobación en el mismo proceso no toca la base
+        assert ensure_schema(conn) is False
+    
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA user_version").scalar() == SCHEMA_VERSION
+        assert "version" in {column["name"] for column in inspect(conn).get_columns("users")}
+        assert conn.exec_driver_sql("SELECT rowid FROM users_fts WHERE users_fts MATCH '\"legacy\"'").scalar() == 1
+    
+    # La tabla users reconstruida con AUTOINCREMENT no reutiliza el id borrado
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM users WHERE id = 1")
+        conn.exec_driver_sql("INSERT INTO users (username, email, hashed_password, role_id) VALUES ('new', 'new@example.com', 'x', 1)")
+        assert conn.exec_driver_sql("SELECT id FROM users").scalar() == 2
+        assert conn.exec_driver_sql("SELECT user_count FROM role_stats WHERE role_id = 1").scalar() == 1
+    engine.dispose()
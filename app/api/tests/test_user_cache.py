@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from httpx import AsyncClient
+from api.core.user_cache import LocalUserBackend, RedisUserBackend, UserCache, user_cache
+
+async def _eventually(condition, timeout: float = 2.0):
+    # Las invalidaciones por pub/sub llegan de forma asíncrona
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+@pytest.mark.asyncio
+async def test_read_user_is_cached_and_invalidated_on_update(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.post("/api/v1/users/", json={
+        "username": "cacheduser1",
+        "email": "cacheduser1@example.com",
+        "password": "testpassword",
+        "role_id": 3
+    })
+    user_id = response.json()["id"]
+
+    response = await client.get(f"/api/v1/users/{user_id}", headers=headers)
+    etag = response.headers["ETag"]
+    hits = user_cache.hits
+    response = await client.get(f"/api/v1/users/{user_id}", headers=headers)
+    assert user_cache.hits == hits + 1
+    assert response.headers["ETag"] == etag
+
+    await client.put(f"/api/v1/users/{user_id}", json={"email": "cacheduser2@example.com"}, headers=headers)
+    response = await client.get(f"/api/v1/users/{user_id}", headers=headers)
+    assert response.json()["email"] == "cacheduser2@example.com"
+    assert response.headers["ETag"] != etag
+
+    response = await client.get("/api/v1/users/batch", params={"ids": f"{user_id},999999"}, headers=headers)
+    assert response.json() == {str(user_id): {"id": user_id, "username": "cacheduser1", "email": "cacheduser2@example.com", "role_id": 3}, "999999": None}
+
+@pytest.mark.asyncio
+async def test_read_before_invalidation_is_not_cached():
+    cache = UserCache(LocalUserBackend(maxsize=10, ttl=60), ttl=60)
+    since = cache.begin_read()
+    # Una escritura confirmada entre la lectura y el set: la fila leída ya es vieja
+    await cache.invalidate([1])
+    await cache.set_many({1: {"id": 1, "version": 1}}, since)
+    assert await cache.get_many([1]) == {}
+    assert cache.stale_sets_skipped == 1
+
+@pytest.mark.asyncio
+async def test_local_caches_are_invalidated_over_pubsub():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = UserCache(LocalUserBackend(maxsize=10, ttl=60), client=fakeredis.aioredis.FakeRedis(server=server), ttl=60)
+    worker_b = UserCache(LocalUserBackend(maxsize=10, ttl=60), client=fakeredis.aioredis.FakeRedis(server=server), ttl=60)
+    invalidated = []
+    worker_b.on_invalidate(invalidated.extend)
+    await worker_a.start()
+    await worker_b.start()
+    try:
+        for worker in (worker_a, worker_b):
+            await worker.set_many({7: {"id": 7, "version": 1}}, worker.begin_read())
+        await worker_a.invalidate([7])
+        assert await worker_a.get_many([7]) == {}
+        await _eventually(lambda: worker_b.invalidations_received == 1)
+        assert await worker_b.get_many([7]) == {}
+        assert invalidated == [7]
+        assert worker_a.invalidations_received == 0  # Su propio mensaje se ignora
+    finally:
+        await worker_a.stop()
+        await worker_b.stop()
+
+@pytest.mark.asyncio
+async def test_redis_backend_is_shared_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    clients = [fakeredis.aioredis.FakeRedis(server=server) for _ in range(2)]
+    worker_a, worker_b = (UserCache(RedisUserBackend(client, ttl=60), client=client, ttl=60) for client in clients)
+    await worker_a.set_many({7: {"id": 7, "email": "a@example.com", "version": 1}}, worker_a.begin_read())
+    assert await worker_b.get_many([7, 8]) == {7: {"id": 7, "email": "a@example.com", "version": 1}}
+    await worker_a.invalidate([7])
+    assert await worker_b.get_many([7]) == {}
+    assert worker_b.stats()["hit_ratio"] == 1 / 3
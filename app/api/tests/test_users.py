@@ -1,7 +1,9 @@
+import json
 import pytest
 from httpx import AsyncClient
 from sqlalchemy.orm import Session
 from api.models.user import User
+from api.core.security import create_access_token, token_claims
 
 @pytest.mark.asyncio
 async def test_create_user(client: AsyncClient, admin_token: str, db_session: Session):
@@ -44,6 +46,7 @@ async def test_list_users(client: AsyncClient, admin_token: str):
     assert response.status_code == 200
     assert isinstance(response.json(), list)
     assert len(response.json()) >= 1  # Al menos el admin existe
+    assert set(response.json()[0]) == {"id", "username", "email", "role_id"}
 
 @pytest.mark.asyncio
 async def test_get_user(client: AsyncClient, admin_token: str, db_session: Session):
@@ -109,3 +112,229 @@ async def test_unauthorized_access(client: AsyncClient):
     assert response.status_code == 401
     assert response.json()["detail"] == "Not authenticated"
 
+
+@pytest.mark.asyncio
+async def test_role_change_invalidates_tokens(client: AsyncClient, admin_token: str):
+    # Crear un usuario sin privilegios y autenticarlo
+    response = await client.post("/api/v1/users/", json={
+        "username": "testpromoteuser",
+        "email": "testpromoteuser@example.com",
+        "password": "testpassword",
+        "role_id": 3
+    })
+    assert response.status_code == 201
+    user_id = response.json()["id"]
+    response = await client.post("/api/v1/auth/login", json={
+        "username": "testpromoteuser",
+        "password": "testpassword"
+    })
+    user_token = response.json()["access_token"]
+
+    response = await client.get("/api/v1/users/", headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 403
+
+    # Promover a admin: los tokens con el rol anterior dejan de ser válidos
+    response = await client.put(
+        f"/api/v1/users/{user_id}",
+        json={"role_id": 1},
+        headers={"Authorization": f"Bearer {admin_token}"}
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/api/v1/users/", headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 401
+
+    # Un login nuevo lleva el rol actualizado en los claims
+    response = await client.post("/api/v1/auth/login", json={
+        "username": "testpromoteuser",
+        "password": "testpassword"
+    })
+    user_token = response.json()["access_token"]
+    response = await client.get("/api/v1/users/", headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 200
+
+@pytest.mark.asyncio
+async def test_list_users_cursor_pagination(client: AsyncClient, admin_token: str, db_session: Session):
+    for i in range(3):
+        db_session.add(User(
+            username=f"testpageuser{i}",
+            email=f"testpageuser{i}@example.com",
+            hashed_password="hashedpassword",
+            role_id=3
+        ))
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {admin_token}"}
+
+    # Recorrer las páginas siguiendo el cursor opaco
+    seen = []
+    params = {"limit": 2, "username_prefix": "testpageuser"}
+    while True:
+        response = await client.get("/api/v1/users/", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(user["username"] for user in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if not next_cursor:
+            break
+        params["cursor"] = next_cursor
+    assert seen == ["testpageuser0", "testpageuser1", "testpageuser2"]
+
+    response = await client.get("/api/v1/users/", params={"role_id": 3, "username_prefix": "testpageuser1"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["testpageuser1"]
+
+    response = await client.get("/api/v1/users/", params={"cursor": "not-a-cursor"}, headers=headers)
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_export_users(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    response = await client.get("/api/v1/users/export", params={"format": "ndjson"}, headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows[0]["username"] == "admin"
+    assert set(rows[0]) == {"id", "username", "email", "role_id"}
+
+    response = await client.get("/api/v1/users/export", params={"format": "csv"}, headers=headers)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "id,username,email,role_id"
+    assert len(lines) == len(rows) + 1
+
+@pytest.mark.asyncio
+async def test_bulk_create_users(client: AsyncClient, admin_token: str):
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    rows = [
+        {"username": "testbulk0", "email": "testbulk0@example.com", "password": "testpassword", "role_id": 3},
+        {"username": "admin", "email": "testbulk1@example.com", "password": "testpassword", "role_id": 3},
+        {"username": "testbulk2", "email": "testbulk0@example.com", "password": "testpassword", "role_id": 3},
+        {"username": "testbulk3", "email": "testbulk3@example.com", "password": "testpassword", "role_id": 999},
+        {"username": "testbulk4", "email": "not-an-email", "password": "testpassword", "role_id": 3},
+    ]
+    response = await client.post("/api/v1/users/bulk", json=rows, headers=headers)
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["status"] for result in results] == ["created", "error", "error", "error", "error"]
+    assert results[0]["id"] is not None
+    assert results[1]["detail"] == "Username already registered"
+    assert results[2]["detail"] == "Email already registered"
+    assert results[3]["detail"] == "Role does not exist"
+
+    # Mismo formato por NDJSON
+    body = "\n".join(json.dumps(row) for row in [
+        {"username": "testbulk5", "email": "testbulk5@example.com", "password": "testpassword", "role_id": 2},
+    ]) + "\nnot json\n"
+    response = await client.post(
+        "/api/v1/users/bulk",
+        content=body,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert [result["status"] for result in response.json()] == ["created", "error"]
+
+@pytest.mark.asyncio
+async def test_user_etag_and_if_match(client: AsyncClient, admin_token: str, db_session: Session):
+    user = User(
+        username="etaguser",
+        email="etaguser@example.com",
+        hashed_password="hashedpassword",
+        role_id=2
+    )
+    db_session.add(user)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    response = await client.get(f"/api/v1/users/{user.id}", headers=headers)
+    etag = response.headers["ETag"]
+    response = await client.get(f"/api/v1/users/{user.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    
+    # La primera escritura con el ETag vigente se aplica y cambia la versión
+    response = await client.put(f"/api/v1/users/{user.id}", json={"username": "etaguser2"}, headers={**headers, "If-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    
+    # Una segunda escritura con el ETag antiguo se rechaza
+    response = await client.put(f"/api/v1/users/{user.id}", json={"username": "etaguser3"}, headers={**headers, "If-Match": etag})
+    assert response.status_code == 412
+    response = await client.get(f"/api/v1/users/{user.id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["username"] == "etaguser2"
+
+@pytest.mark.asyncio
+async def test_search_users(client: AsyncClient, admin_token: str, db_session: Session):
+    for i in range(5):
+        db_session.add(User(
+            username=f"searchable{i}",
+            email=f"findme{i}@example.com",
+            hashed_password="hashedpassword",
+            role_id=3
+        ))
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    # Recorrer los resultados con el cursor, de dos en dos
+    found, params = [], {"q": "archab", "limit": 2}
+    while True:
+        response = await client.get("/api/v1/users/search", params=params, headers=headers)
+        assert response.status_code == 200
+        found.extend(user["username"] for user in response.json())
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+    assert sorted(found) == [f"searchable{i}" for i in range(5)]
+    
+    # El índice sigue a las actualizaciones y borrados
+    user = db_session.query(User).filter(User.username == "searchable0").first()
+    user.email = "renamed@example.com"
+    db_session.commit()
+    response = await client.get("/api/v1/users/search", params={"q": "findme"}, headers=headers)
+    assert len(response.json()) == 4
+    response = await client.get("/api/v1/users/search", params={"q": "renamed@"}, headers=headers)
+    assert [user["username"] for user in response.json()] == ["searchable0"]
+
+@pytest.mark.asyncio
+async def test_read_users_batch(client: AsyncClient, admin_token: str, db_session: Session):
+    user = User(
+        username="batchuser",
+        email="batchuser@example.com",
+        hashed_password="hashedpassword",
+        role_id=3
+    )
+    db_session.add(user)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {admin_token}"}
+    
+    response = await client.get("/api/v1/users/batch", params={"ids": f"{user.id},999999,{user.id}"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == {
+        str(user.id): {"id": user.id, "username": "batchuser", "email": "batchuser@example.com", "role_id": 3},
+        "999999": None,
+    }
+    
+    response = await client.post("/api/v1/users/batch", json={"ids": [user.id]}, headers=headers)
+    assert response.json()[str(user.id)]["username"] == "batchuser"
+    
+    # Un usuario normal no puede resolver ids ajenos
+    user_token = create_access_token(data=token_claims(user.id, "batchuser", 3, "viewer", 1))
+    response = await client.post("/api/v1/users/batch", json={"ids": [user.id, 1]}, headers={"Authorization": f"Bearer {user_token}"})
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_deleted_user_token_is_not_revived_by_recreation(client: AsyncClient, admin_token: str):
+    # Usuario con el id más alto: sin AUTOINCREMENT, SQLite daría su id al siguiente registro
+    user_data = {"username": "testrecreated", "email": "testrecreated@example.com", "password": "testpassword", "role_id": 3}
+    response = await client.post("/api/v1/users/", json=user_data)
+    user_id = response.json()["id"]
+    response = await client.post("/api/v1/auth/login", json={"username": "testrecreated", "password": "testpassword"})
+    old_token = response.json()["access_token"]
+    old_refresh = response.json()["refresh_token"]
+
+    response = await client.delete(f"/api/v1/users/{user_id}", headers={"Authorization": f"Bearer {admin_token}"})
+    assert response.status_code == 204
+    response = await client.post("/api/v1/users/", json=user_data)
+    assert response.json()["id"] != user_id
+
+    response = await client.get(f"/api/v1/users/{user_id}", headers={"Authorization": f"Bearer {old_token}"})
+    assert response.status_code == 401
+    response = await client.post("/api/v1/auth/refresh", json={"refresh_token": old_refresh})
+    assert response.status_code == 401
@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ...core.audit import AuditWriter
+from ...core.config import settings
+from ...core.pagination import decode_cursor, set_next_cursor
+from ...core.serialization import RowsJSONResponse
+from ...database.database import get_async_db
+from ...dependencies.audit import get_audit_writer
+from ...dependencies.auth import get_current_user
+from ...models.audit_log import AuditLog
+from ...schemas.audit import AuditLogOut
+from ...schemas.auth import CurrentUser
+
+router = APIRouter(
+    prefix="/api/v1/audit",
+    tags=["audit"],
+)
+
+AUDIT_COLUMNS = (
+    AuditLog.id, AuditLog.created_at, AuditLog.actor_id, AuditLog.action,
+    AuditLog.entity_type, AuditLog.entity_id, AuditLog.details,
+)
+
+@router.get("/", response_model=List[AuditLogOut])
+async def read_audit_log(
+    limit: int = Query(100, ge=1, le=settings.AUDIT_PAGE_MAX),
+    cursor: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    actor_id: Optional[int] = None,
+    action: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+    audit: AuditWriter = Depends(get_audit_writer),
+):
+    # Solo admin puede consultar la auditoría
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view the audit log")
+    
+    # Incluir los eventos de este worker que aún están en la cola (con espera acotada:
+    # si el escritor va con retraso se devuelve lo que ya está confirmado)
+    await audit.flush()
+    
+    # Del más reciente al más antiguo; el cursor es el último id visto
+    query = select(*AUDIT_COLUMNS).order_by(AuditLog.id.desc()).limit(limit)
+    if cursor:
+        (last_id,) = decode_cursor(cursor)
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(AuditLog.id < last_id)
+    if entity_type:
+        query = query.where(AuditLog.entity_type == entity_type)
+    if entity_id is not None:
+        query = query.where(AuditLog.entity_id == entity_id)
+    if actor_id is not None:
+        query = query.where(AuditLog.actor_id == actor_id)
+    if action:
+        query = query.where(AuditLog.action == action)
+    
+    rows = (await db.execute(query)).all()
+    response = RowsJSONResponse(["id", "created_at", "actor_id", "action", "entity_type", "entity_id", "details"], rows)
+    set_next_cursor(response, rows, limit)
+    return response
@@ -1,26 +1,112 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from ...database.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ...database.database import get_async_db
 from ...models.user import User
-from ...schemas.auth import Login, Token
-from ...core.security import verify_password, create_access_token
+from ...schemas.auth import CurrentUser, Login, LogoutRequest, RefreshRequest, Token
+from ...core.rate_limit import login_throttle
+from ...core.revocation import revocation_store
+from ...core.role_catalog import role_catalog
+from ...core.security import (
+    verify_password_async,
+    create_access_token,
+    create_refresh_token,
+    decode_access_token,
+    decode_refresh_token,
+    token_claims,
+)
+from ...dependencies.auth import get_current_user, oauth2_scheme
 
 router = APIRouter(
     prefix="/api/v1/auth",
     tags=["auth"],
 )
 
+async def issue_tokens(db: AsyncSession, user) -> dict:
+    # `user` aporta id, username, role_id y token_version (fila u objeto ORM)
+    roles = await role_catalog.refresh_if_stale(db)
+    claims = token_claims(user.id, user.username, user.role_id, roles.by_id.get(user.role_id, ""), user.token_version)
+    return {
+        "access_token": create_access_token(data=claims),
+        "refresh_token": create_refresh_token(data=claims),
+        "token_type": "bearer",
+    }
+
 @router.post("/login", response_model=Token)
-def login_for_access_token(login: Login, db: Session = Depends(get_db)):
+async def login_for_access_token(login: Login, request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Rechazar el exceso de intentos antes de tocar la base de datos o bcrypt
+    client_ip = request.client.host if request.client else "unknown"
+    retry_after = login_throttle.check(login.username, client_ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts",
+            headers={"Retry-After": str(retry_after)},
+        )
+    
     # Buscar el usuario por username
-    user = db.query(User).filter(User.username == login.username).first()
-    if not user or not verify_password(login.password, user.hashed_password):
+    user = await db.scalar(select(User).where(User.username == login.username))
+    if not user or not await verify_password_async(login.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Generar token JWT
-    access_token = create_access_token(data={"sub": user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
+    # Generar tokens JWT (acceso + refresh)
+    return await issue_tokens(db, user)
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    # Renovar sin contraseña: no hay trabajo de bcrypt
+    claims = decode_refresh_token(request.refresh_token)
+    await revocation_store.sync(db)
+    if revocation_store.is_revoked(claims["jti"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # El usuario debe seguir existiendo y no haber cambiado de rol o contraseña; los claims
+    # nuevos se leen de la base de datos
+    user = (await db.execute(
+        select(User.id, User.username, User.role_id, User.token_version).where(User.id == claims["uid"])
+    )).first()
+    if user is None or (user.token_version, user.username) != (claims["tv"], claims["username"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
+    # Rotación: el refresh token usado queda revocado. Si otra petición lo ha revocado
+    # entre la comprobación y aquí, es una reutilización: solo la primera recibe tokens nuevos
+    if not await revocation_store.revoke(db, claims["jti"], claims["exp"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await issue_tokens(db, user)
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(
+    request: Optional[LogoutRequest] = None,
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    # Solo se puede revocar el refresh token propio
+    refresh_claims = None
+    if request and request.refresh_token:
+        refresh_claims = decode_refresh_token(request.refresh_token)
+        if refresh_claims["uid"] != current_user.id:
+            raise HTTPException(status_code=403, detail="Not authorized to revoke this token")
+    
+    claims = decode_access_token(token)
+    await revocation_store.revoke(db, claims["jti"], claims["exp"])
+    if refresh_claims:
+        await revocation_store.revoke(db, refresh_claims["jti"], refresh_claims["exp"])
+    return None
\ No newline at end of file
@@ -1,11 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ...database.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+from typing import List, Optional
+from ...core.audit import AuditWriter
+from ...core.conditional import if_match_versions, make_etag, not_modified, precondition_failed
+from ...core.pagination import apply_keyset, set_next_cursor
+from ...core.serialization import RowsJSONResponse
+from ...database.database import get_async_db
 from ...models.role import Role
+from ...models.role_stat import RoleStat, role_stats_maintained
 from ...models.user import User
-from ...schemas.role import RoleCreate, RoleUpdate, RoleOut
-from ...schemas.auth import TokenData
+from ...schemas.role import RoleCreate, RoleUpdate, RoleOut, RoleStatsOut
+from ...schemas.auth import CurrentUser
+from ...core.role_catalog import role_catalog
+from ...dependencies.audit import get_audit_writer
 from ...dependencies.auth import get_current_user
 
 """ INSERT INTO roles (name) VALUES ('admin');
@@ -19,82 +28,132 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=RoleOut, status_code=status.HTTP_201_CREATED)
-def create_role(role: RoleCreate, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def create_role(role: RoleCreate, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user), audit: AuditWriter = Depends(get_audit_writer)):
     # Solo admin puede crear roles
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user or db.query(Role).filter(Role.id == user.role_id, Role.name == "admin").first() is None:
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to create roles")
     
     # Verificar si el nombre del rol ya existe
-    if db.query(Role).filter(Role.name == role.name).first():
+    if await db.scalar(select(Role.id).where(Role.name == role.name)):
         raise HTTPException(status_code=400, detail="Role name already exists")
     
     # Crear el rol
     db_role = Role(name=role.name)
     db.add(db_role)
-    db.commit()
-    db.refresh(db_role)
+    await role_catalog.bump_version(db)
+    await db.commit()
+    await db.refresh(db_role)
+    # Publicar el nuevo snapshot del catálogo
+    await role_catalog.load(db)
+    await audit.record("create", "role", db_role.id, actor_id=current_user.id, details={"name": db_role.name})
     return db_role
 
 @router.get("/", response_model=List[RoleOut])
-def read_roles(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def read_roles(skip: int = 0, limit: int = 100, cursor: Optional[str] = None, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
     # Solo admin puede listar todos los roles
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user or db.query(Role).filter(Role.id == user.role_id, Role.name == "admin").first() is None:
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to list roles")
     
-    roles = db.query(Role).offset(skip).limit(limit).all()
-    return roles
+    rows = (await db.execute(apply_keyset(select(Role.name, Role.id), Role.id, cursor, skip, limit))).all()
+    response = RowsJSONResponse(["name", "id"], rows)
+    set_next_cursor(response, rows, limit)
+    return response
+
+@router.get("/stats", response_model=List[RoleStatsOut])
+async def read_role_stats(db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
+    # Solo admin puede ver las estadísticas de roles
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to view role stats")
+    
+    # Una fila por rol: coste proporcional al número de roles, no de usuarios
+    # (sin contadores mantenidos, COUNT agrupado sobre users)
+    if role_stats_maintained(db.get_bind().dialect.name):
+        query = (
+            select(Role.id, Role.name, func.coalesce(RoleStat.user_count, 0))
+            .outerjoin(RoleStat, RoleStat.role_id == Role.id)
+        )
+    else:
+        query = (
+            select(Role.id, Role.name, func.count(User.id))
+            .outerjoin(User, User.role_id == Role.id)
+            .group_by(Role.id, Role.name)
+        )
+    rows = (await db.execute(query.order_by(Role.id))).all()
+    return RowsJSONResponse(["role_id", "name", "user_count"], rows)
 
 @router.get("/{role_id}", response_model=RoleOut)
-def read_role(role_id: int, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def read_role(role_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
     # Solo admin puede ver detalles de un rol
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user or db.query(Role).filter(Role.id == user.role_id, Role.name == "admin").first() is None:
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to view this role")
     
-    role = db.query(Role).filter(Role.id == role_id).first()
+    role = (await db.execute(select(Role.name, Role.id, Role.version).where(Role.id == role_id))).mappings().first()
     if not role:
         raise HTTPException(status_code=404, detail="Role not found")
     
-    return role
+    etag = make_etag(role["version"])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
+    return dict(role)
 
 @router.put("/{role_id}", response_model=RoleOut)
-def update_role(role_id: int, role_update: RoleUpdate, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def update_role(role_id: int, role_update: RoleUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user), audit: AuditWriter = Depends(get_audit_writer)):
     # Solo admin puede actualizar roles
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user or db.query(Role).filter(Role.id == user.role_id, Role.name == "admin").first() is None:
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to update roles")
     
-    db_role = db.query(Role).filter(Role.id == role_id).first()
+    db_role = await db.get(Role, role_id)
     if not db_role:
         raise HTTPException(status_code=404, detail="Role not found")
     
+    # If-Match: comparar con la versión leída; el UPDATE del ORM vuelve a comprobarla (version_id_col)
+    expected_versions = if_match_versions(request)
+    if expected_versions is not None and db_role.version not in expected_versions:
+        raise precondition_failed()
+    
     # Actualizar solo los campos proporcionados
+    previous_name = db_role.name
     if role_update.name:
-        if db.query(Role).filter(Role.name == role_update.name, Role.id != role_id).first():
+        if await db.scalar(select(Role.id).where(Role.name == role_update.name, Role.id != role_id)):
             raise HTTPException(status_code=400, detail="Role name already exists")
         db_role.name = role_update.name
+        await role_catalog.bump_version(db)
     
-    db.commit()
-    db.refresh(db_role)
+    try:
+        await db.commit()
+    except StaleDataError:
+        await db.rollback()
+        raise precondition_failed()
+    await db.refresh(db_role)
+    await role_catalog.load(db)
+    if db_role.name != previous_name:
+        await audit.record("update", "role", role_id, actor_id=current_user.id, details={"name": db_role.name, "previous_name": previous_name})
+    response.headers["ETag"] = make_etag(db_role.version)
     return db_role
 
 @router.delete("/{role_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_role(role_id: int, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def delete_role(role_id: int, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user), audit: AuditWriter = Depends(get_audit_writer)):
     # Solo admin puede eliminar roles
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user or db.query(Role).filter(Role.id == user.role_id, Role.name == "admin").first() is None:
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to delete roles")
     
-    role = db.query(Role).filter(Role.id == role_id).first()
+    role = await db.get(Role, role_id)
     if not role:
         raise HTTPException(status_code=404, detail="Role not found")
     
-    # Verificar si el rol está asignado a algún usuario
-    if db.query(User).filter(User.role_id == role_id).first():
+    # Verificar si el rol está asignado a algún usuario (contador por rol, O(1); sin contadores, EXISTS)
+    if role_stats_maintained(db.get_bind().dialect.name):
+        in_use = await db.scalar(select(RoleStat.user_count).where(RoleStat.role_id == role_id))
+    else:
+        in_use = await db.scalar(select(exists().where(User.role_id == role_id)))
+    if in_use:
         raise HTTPException(status_code=400, detail="Cannot delete role assigned to users")
     
-    db.delete(role)
-    db.commit()
+    await db.delete(role)
+    await role_catalog.bump_version(db)
+    await db.commit()
+    await role_catalog.load(db)
+    await audit.record("delete", "role", role_id, actor_id=current_user.id, details={"name": role.name})
     return None
\ No newline at end of file
@@ -1,12 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
-from ...database.database import get_db
-from ...models.user import User
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy import case, delete, insert, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from typing import Dict, List, Optional, Union
+from ...database.database import get_async_db, get_async_sessionmaker
 from ...models.role import Role
-from ...schemas.user import UserCreate, UserUpdate, UserOut
-from ...schemas.auth import TokenData
-from ...core.security import get_password_hash, verify_password
+from ...models.user import User, users_fts
+from ...schemas.user import UserBatchRequest, UserBulkResult, UserCreate, UserUpdate, UserOut, UserWithRoleOut
+from ...schemas.auth import CurrentUser
+from ...core.conditional import if_match_versions, make_etag, not_modified, precondition_failed
+from ...core.bulk_import import import_users, iter_json_array, iter_ndjson
+from ...core.export import EXPORT_MEDIA_TYPES, stream_rows
+from ...core.pagination import NEXT_CURSOR_HEADER, apply_keyset, decode_cursor, encode_cursor, set_next_cursor
+from ...core.audit import AuditWriter
+from ...core.config import settings
+from ...core.serialization import RowsJSONResponse
+from ...core.role_catalog import role_catalog
+from ...core.security import get_password_hash_async
+from ...core.user_cache import user_cache
+from ...dependencies.audit import get_audit_writer
 from ...dependencies.auth import get_current_user
 from fastapi.security import OAuth2PasswordBearer
 
@@ -18,96 +31,333 @@ router = APIRouter(
 # Dependencia para OAuth2
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 
+# Columnas de UserOut devueltas por INSERT/UPDATE ... RETURNING y por los listados
+USER_OUT_COLUMNS = (User.id, User.username, User.email, User.role_id)
+USER_OUT_KEYS = [column.key for column in USER_OUT_COLUMNS]
+
+# Registro guardado en la caché de usuarios: UserOut más la versión para el ETag
+USER_RECORD_COLUMNS = (*USER_OUT_COLUMNS, User.version)
+USER_RECORD_KEYS = [column.key for column in USER_RECORD_COLUMNS]
+
+# expand=role: el rol se lee en la misma consulta con un JOIN (coste constante por página)
+EXPAND_PATTERN = "^role$"
+
+def user_read_statement(expand: Optional[str] = None):
+    if expand == "role":
+        return (
+            select(*USER_OUT_COLUMNS, Role.name.label("role_name"), Role.version.label("role_version"))
+            .join(Role, Role.id == User.role_id)
+        )
+    return select(*USER_OUT_COLUMNS)
+
+def user_items(rows, expand: Optional[str] = None) -> List[dict]:
+    items = [dict(zip(USER_OUT_KEYS, row)) for row in rows]
+    if expand == "role":
+        for item, row in zip(items, rows):
+            item["role"] = {"name": row.role_name, "id": row.role_id}
+    return items
+
+async def read_user_records(db: AsyncSession, ids: List[int]) -> Dict[int, dict]:
+    # Caché de usuarios primero; solo los ids que faltan se leen de la base de datos (una consulta IN)
+    found = await user_cache.get_many(ids)
+    missing = [user_id for user_id in ids if user_id not in found]
+    if missing:
+        since = user_cache.begin_read()
+        rows = (await db.execute(select(*USER_RECORD_COLUMNS).where(User.id.in_(missing)))).all()
+        loaded = {row.id: dict(zip(USER_RECORD_KEYS, row)) for row in rows}
+        await user_cache.set_many(loaded, since)
+        found.update(loaded)
+    return found
+
+def user_out(record: dict) -> dict:
+    return {key: record[key] for key in USER_OUT_KEYS}
+
+def integrity_error_detail(exc: IntegrityError) -> str:
+    # Traducir la restricción violada (UNIQUE / FOREIGN KEY) al mismo mensaje que las comprobaciones previas
+    message = str(exc.orig).lower()
+    if "username" in message:
+        return "Username already registered"
+    if "email" in message:
+        return "Email already registered"
+    if "foreign key" in message or "role_id" in message:
+        return "Role does not exist"
+    raise exc
+
 @router.post("/", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def create_user(user: UserCreate, db: Session = Depends(get_db)):
-    # Verificar si el username o email ya existen
-    if db.query(User).filter(User.username == user.username).first():
-        raise HTTPException(status_code=400, detail="Username already registered")
-    if db.query(User).filter(User.email == user.email).first():
-        raise HTTPException(status_code=400, detail="Email already registered")
-    
-    # Verificar si el role_id existe
-    if not db.query(Role).filter(Role.id == user.role_id).first():
+async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db), audit: AuditWriter = Depends(get_audit_writer)):
+    # Verificar si el role_id existe (catálogo en memoria, sin SQL)
+    if not await role_catalog.has_role(db, user.role_id):
         raise HTTPException(status_code=400, detail="Role does not exist")
     
-    # Crear el usuario
-    hashed_password = get_password_hash(user.password)
-    db_user = User(
-        username=user.username,
-        email=user.email,
-        hashed_password=hashed_password,
-        role_id=user.role_id
-    )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    # Crear el usuario: las restricciones UNIQUE/FOREIGN KEY detectan los conflictos sin SELECT previos
+    hashed_password = await get_password_hash_async(user.password)
+    try:
+        result = await db.execute(
+            insert(User)
+            .values(
+                username=user.username,
+                email=user.email,
+                hashed_password=hashed_password,
+                role_id=user.role_id
+            )
+            .returning(*USER_OUT_COLUMNS)
+        )
+        db_user = dict(result.mappings().one())
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=integrity_error_detail(exc))
+    # Registro público: sin actor
+    await audit.record("create", "user", db_user["id"], details={"role_id": user.role_id})
     return db_user
 
-@router.get("/", response_model=List[UserOut])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+@router.post("/bulk", response_model=List[UserBulkResult])
+async def bulk_create_users(request: Request, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user), audit: AuditWriter = Depends(get_audit_writer)):
+    # Solo admin puede importar usuarios en bloque
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to import users")
+    
+    # Acepta un array JSON o un stream NDJSON (una fila por línea)
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        rows = iter_ndjson(request.stream())
+    else:
+        try:
+            payload = await request.json()
+        except ValueError:
+            payload = None
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array or NDJSON stream")
+        rows = iter_json_array(payload)
+    
+    results = await import_users(db, rows)
+    for result in results:
+        if result.status == "created":
+            await audit.record("create", "user", result.id, actor_id=current_user.id, details={"bulk": True})
+    return results
+
+@router.get("/", response_model=Union[List[UserWithRoleOut], List[UserOut]])
+async def read_users(
+    skip: int = 0,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    role_id: Optional[int] = None,
+    username_prefix: Optional[str] = None,
+    expand: Optional[str] = Query(None, pattern=EXPAND_PATTERN),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
     # Solo admin puede listar todos los usuarios
-    user = db.query(User).filter(User.username == current_user.username).first()
-    if not user or db.query(Role).filter(Role.id == user.role_id, Role.name == "admin").first() is None:
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to list users")
     
-    users = db.query(User).offset(skip).limit(limit).all()
-    return users
+    # Filtros indexados compatibles con el cursor; solo las columnas de UserOut, como tuplas
+    query = user_read_statement(expand)
+    if role_id is not None:
+        query = query.where(User.role_id == role_id)
+    if username_prefix:
+        # Rango sobre el índice de username en lugar de LIKE
+        query = query.where(User.username >= username_prefix, User.username < username_prefix + "\U0010ffff")
+    
+    rows = (await db.execute(apply_keyset(query, User.id, cursor, skip, limit))).all()
+    response = ORJSONResponse(user_items(rows, expand)) if expand else RowsJSONResponse(USER_OUT_KEYS, rows)
+    set_next_cursor(response, rows, limit)
+    return response
 
-@router.get("/{user_id}", response_model=UserOut)
-def read_user(user_id: int, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def read_users_by_ids(ids: List[int], expand: Optional[str], db: AsyncSession, current_user: CurrentUser) -> ORJSONResponse:
+    # Ids únicos en el orden pedido
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="No user ids given")
+    if len(ids) > settings.USER_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {settings.USER_BATCH_MAX_IDS} ids per request")
+    
+    # Autorización una sola vez para todo el lote: un usuario normal solo puede pedir su propio id
+    if not current_user.is_admin and any(user_id != current_user.id for user_id in ids):
+        raise HTTPException(status_code=403, detail="Not authorized to view these users")
+    
+    # Una única consulta IN (sin expand, solo para los ids que no están en caché); los inexistentes quedan como null
+    if expand:
+        rows = (await db.execute(user_read_statement(expand).where(User.id.in_(ids)))).all()
+        found = {item["id"]: item for item in user_items(rows, expand)}
+    else:
+        found = {user_id: user_out(record) for user_id, record in (await read_user_records(db, ids)).items()}
+    return ORJSONResponse({user_id: found.get(user_id) for user_id in ids})
+
+@router.get("/batch", response_model=Union[Dict[int, Optional[UserWithRoleOut]], Dict[int, Optional[UserOut]]])
+async def read_users_batch(
+    ids: str = Query(..., description="Comma-separated user ids"),
+    expand: Optional[str] = Query(None, pattern=EXPAND_PATTERN),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    try:
+        parsed = [int(user_id) for user_id in ids.split(",") if user_id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    return await read_users_by_ids(parsed, expand, db, current_user)
+
+@router.post("/batch", response_model=Union[Dict[int, Optional[UserWithRoleOut]], Dict[int, Optional[UserOut]]])
+async def read_users_batch_post(
+    request: UserBatchRequest,
+    expand: Optional[str] = Query(None, pattern=EXPAND_PATTERN),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    # Variante POST para conjuntos de ids que no caben en la URL
+    return await read_users_by_ids(request.ids, expand, db, current_user)
+
+@router.get("/search", response_model=List[UserOut])
+async def search_users(
+    q: str = Query(..., min_length=3, max_length=100),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    # Solo admin puede buscar entre todos los usuarios
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to search users")
+    
+    # Subcadena en username o email (trigram: mínimo 3 caracteres), ordenada por bm25
+    match = '"' + q.replace('"', '""') + '"'
+    query = (
+        select(*USER_OUT_COLUMNS, users_fts.c.rank)
+        .join(users_fts, users_fts.c.rowid == User.id)
+        .where(users_fts.c.users_fts.op("MATCH")(match))
+    )
+    if cursor:
+        # Cursor keyset sobre (rank, id)
+        last_rank, last_id = decode_cursor(cursor, size=2)
+        if isinstance(last_rank, bool) or not isinstance(last_rank, (int, float)) or not isinstance(last_id, int):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.where(tuple_(users_fts.c.rank, User.id) > tuple_(last_rank, last_id))
+    
+    rows = (await db.execute(query.order_by(users_fts.c.rank, User.id).limit(limit))).all()
+    # zip con USER_OUT_KEYS descarta la columna rank del cuerpo
+    response = RowsJSONResponse(USER_OUT_KEYS, rows)
+    if len(rows) == limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([rows[-1].rank, rows[-1].id])
+    return response
+
+@router.get("/export")
+async def export_users(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    session_factory: async_sessionmaker = Depends(get_async_sessionmaker),
+    current_user: CurrentUser = Depends(get_current_user),
+):
+    # Solo admin puede exportar usuarios
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Not authorized to export users")
+    
+    # Solo las columnas de UserOut, leídas por lotes: memoria constante
+    statement = select(*USER_OUT_COLUMNS).order_by(User.id)
+    return StreamingResponse(
+        stream_rows(session_factory, statement, USER_OUT_KEYS, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+@router.get("/{user_id}", response_model=Union[UserWithRoleOut, UserOut])
+async def read_user(
+    user_id: int,
+    request: Request,
+    expand: Optional[str] = Query(None, pattern=EXPAND_PATTERN),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user),
+):
     # El usuario puede ver su propio perfil o un admin puede ver cualquier perfil
-    user = db.query(User).filter(User.id == user_id).first()
+    # (sin expand, desde la caché de usuarios)
+    if expand:
+        user = (await db.execute(user_read_statement(expand).add_columns(User.version).where(User.id == user_id))).first()
+    else:
+        user = (await read_user_records(db, [user_id])).get(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    current_user_db = db.query(User).filter(User.username == current_user.username).first()
-    if current_user_db.id != user_id and db.query(Role).filter(Role.id == current_user_db.role_id, Role.name == "admin").first() is None:
+    if current_user.id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to view this user")
     
-    return user
+    # Si el cliente ya tiene esta versión se responde 304 sin serializar el cuerpo;
+    # con expand=role el ETag incluye también la versión del rol
+    etag = make_etag(user.version, user.role_version) if expand else make_etag(user["version"])
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    item = user_items([user], expand)[0] if expand else user_out(user)
+    return ORJSONResponse(item, headers={"ETag": etag})
 
 @router.put("/{user_id}", response_model=UserOut)
-def update_user(user_id: int, user_update: UserUpdate, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def update_user(user_id: int, user_update: UserUpdate, request: Request, response: Response, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user), audit: AuditWriter = Depends(get_audit_writer)):
     # El usuario puede actualizar su propio perfil o un admin puede actualizar cualquier perfil
-    db_user = db.query(User).filter(User.id == user_id).first()
-    if not db_user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    current_user_db = db.query(User).filter(User.username == current_user.username).first()
-    if current_user_db.id != user_id and db.query(Role).filter(Role.id == current_user_db.role_id, Role.name == "admin").first() is None:
+    if current_user.id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to update this user")
     
     # Actualizar solo los campos proporcionados
+    values = {}
     if user_update.username:
-        if db.query(User).filter(User.username == user_update.username, User.id != user_id).first():
-            raise HTTPException(status_code=400, detail="Username already registered")
-        db_user.username = user_update.username
+        values["username"] = user_update.username
     if user_update.email:
-        if db.query(User).filter(User.email == user_update.email, User.id != user_id).first():
-            raise HTTPException(status_code=400, detail="Email already registered")
-        db_user.email = user_update.email
-    if user_update.password:
-        db_user.hashed_password = get_password_hash(user_update.password)
+        values["email"] = user_update.email
     if user_update.role_id:
-        if not db.query(Role).filter(Role.id == user_update.role_id).first():
+        if not await role_catalog.has_role(db, user_update.role_id):
             raise HTTPException(status_code=400, detail="Role does not exist")
-        db_user.role_id = user_update.role_id
+        values["role_id"] = user_update.role_id
+    if user_update.password:
+        values["hashed_password"] = await get_password_hash_async(user_update.password)
+    # Los tokens emitidos con el rol o la contraseña anteriores dejan de ser válidos
+    if "hashed_password" in values:
+        values["token_version"] = User.token_version + 1
+    elif "role_id" in values:
+        # Solo si el rol cambia de verdad (en el SET, User.role_id es el valor anterior)
+        values["token_version"] = User.token_version + case((User.role_id != values["role_id"], 1), else_=0)
     
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    # Un único UPDATE ... RETURNING que incrementa la versión; sin campos, basta con leer la fila
+    if values:
+        statement = (
+            update(User)
+            .where(User.id == user_id)
+            .values(**values, version=User.version + 1)
+            .returning(*USER_OUT_COLUMNS, User.version)
+        )
+    else:
+        statement = select(*USER_OUT_COLUMNS, User.version).where(User.id == user_id)
+    expected_versions = if_match_versions(request)
+    if expected_versions is not None:
+        # If-Match: la escritura solo se aplica sobre la versión que vio el cliente
+        statement = statement.where(User.version.in_(expected_versions))
+    try:
+        db_user = (await db.execute(statement)).mappings().first()
+        await db.commit()
+    except IntegrityError as exc:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=integrity_error_detail(exc))
+    if db_user is None:
+        # Solo en el camino de error se distingue fila inexistente de versión obsoleta
+        if expected_versions is not None and await db.scalar(select(User.id).where(User.id == user_id)):
+            raise precondition_failed()
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if values:
+        # Tras el commit: borra la entrada (y el token_version) aquí y en el resto de workers
+        await user_cache.invalidate([user_id])
+        # Solo los nombres de los campos: ni contraseñas ni hashes en la auditoría
+        fields = sorted("password" if key == "hashed_password" else key for key in values if key != "token_version")
+        await audit.record("update", "user", user_id, actor_id=current_user.id, details={"fields": fields})
+    response.headers["ETag"] = make_etag(db_user["version"])
+    return dict(db_user)
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: int, db: Session = Depends(get_db), current_user: TokenData = Depends(get_current_user)):
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user), audit: AuditWriter = Depends(get_audit_writer)):
     # Solo admin puede eliminar usuarios
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    current_user_db = db.query(User).filter(User.username == current_user.username).first()
-    if db.query(Role).filter(Role.id == current_user_db.role_id, Role.name == "admin").first() is None:
+    if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not authorized to delete users")
     
-    db.delete(user)
-    db.commit()
+    deleted = await db.scalar(delete(User).where(User.id == user_id).returning(User.id))
+    if deleted is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.commit()
+    
+    # Sin fila, la comprobación de token_version rechaza sus tokens; el id no se reutiliza (AUTOINCREMENT)
+    await user_cache.invalidate([user_id])
+    await audit.record("delete", "user", user_id, actor_id=current_user.id)
     return None
\ No newline at end of file
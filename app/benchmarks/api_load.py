@@ -0,0 +1,179 @@
+# Benchmark de carga de la API: login, GET /users/{id}, páginas del listado y alta de usuarios.
+# Uso (desde la raíz del repositorio):
+#   python -m app.benchmarks.api_load --users 10000 --requests 500 --concurrency 16 --output report.json
+#   python -m app.benchmarks.api_load --url http://127.0.0.1:8000 --users 10000
+# En modo en proceso se crea una base temporal con los usuarios sembrados y se usa el transporte ASGI.
+# Con --url la base del servidor debe estar sembrada con `python -m app.init_db --users N`
+# y el límite de login desactivado (LOGIN_RATE_LIMIT_ENABLED=false).
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List
+import httpx
+
+# Mismos valores que siembra `python -m app.init_db --users N`
+SEED_PREFIX = "user"
+SEED_PASSWORD = "userpassword"
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "adminpassword"
+SCENARIOS = ("login", "get_user", "list_users", "create_user")
+
+def seed(database_url: str, users: int) -> None:
+    from ..api.database.database import create_db_engine
+    from ..init_db import init_db
+
+    engine = create_db_engine(database_url)
+    try:
+        init_db(engine, users=users)
+    finally:
+        engine.dispose()
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    # Percentil por rango más cercano
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+async def run_scenario(requests: int, concurrency: int, call: Callable[[int], Awaitable[httpx.Response]]) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            response = await call(i)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(requests / elapsed, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+def build_scenarios(client: httpx.AsyncClient, users: int, headers: Dict[str, str]) -> Dict[str, Callable[[int], Awaitable[httpx.Response]]]:
+    run_id = uuid.uuid4().hex[:8]
+    cursor = {"next": None}
+
+    async def login(i: int) -> httpx.Response:
+        username = f"{SEED_PREFIX}{random.randrange(users)}"
+        return await client.post("/api/v1/auth/login", json={"username": username, "password": SEED_PASSWORD})
+
+    async def get_user(i: int) -> httpx.Response:
+        # Ids 2..users+1 son los usuarios sembrados (el 1 es el admin)
+        return await client.get(f"/api/v1/users/{random.randint(2, users + 1)}", headers=headers)
+
+    async def list_users(i: int) -> httpx.Response:
+        # Recorre el listado con el cursor keyset y vuelve a empezar al llegar al final
+        params = {"limit": 50}
+        if cursor["next"]:
+            params["cursor"] = cursor["next"]
+        response = await client.get("/api/v1/users/", params=params, headers=headers)
+        cursor["next"] = response.headers.get("X-Next-Cursor")
+        return response
+
+    async def create_user(i: int) -> httpx.Response:
+        return await client.post("/api/v1/users/", json={
+            "username": f"load{run_id}_{i}",
+            "email": f"load{run_id}_{i}@example.com",
+            "password": SEED_PASSWORD,
+            "role_id": 3,
+        })
+
+    return {"login": login, "get_user": get_user, "list_users": list_users, "create_user": create_user}
+
+@asynccontextmanager
+async def open_client(args):
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=60) as client:
+            yield client
+        return
+
+    # La app lee la configuración al importarse: la base temporal se fija antes
+    from ..main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+async def run(args) -> dict:
+    report = {
+        "target": args.url or "asgi",
+        "users": args.users,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "scenarios": {},
+    }
+    async with open_client(args) as client:
+        response = await client.post("/api/v1/auth/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+        response.raise_for_status()
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        scenarios = build_scenarios(client, args.users, headers)
+        for name in args.scenarios:
+            report["scenarios"][name] = await run_scenario(args.requests, args.concurrency, scenarios[name])
+    return report
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga y latencia de la API")
+    parser.add_argument("--users", type=int, default=10000, help="Usuarios sembrados (o ya presentes con --url)")
+    parser.add_argument("--requests", type=int, default=500, help="Peticiones por escenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--url", help="Servidor uvicorn en marcha; por defecto la app se ejecuta en proceso")
+    parser.add_argument("--profile", default="default", help="DATABASE_PROFILE de la base temporal")
+    parser.add_argument("--output", help="Fichero donde escribir el informe JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if not args.url:
+            database_url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+            os.environ["DATABASE_URL"] = database_url
+            os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+            os.environ["DATABASE_PROFILE"] = args.profile
+            os.environ["LOGIN_RATE_LIMIT_ENABLED"] = "false"
+            started = time.perf_counter()
+            seed(database_url, args.users)
+            print(f"Seeded {args.users} users in {time.perf_counter() - started:.1f}s", flush=True)
+        report = asyncio.run(run(args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# Compara el throughput de lectura/escritura concurrente entre el perfil SQLite por defecto y el de producción.
+# Uso (desde la raíz del repositorio): python -m app.benchmarks.sqlite_concurrency --seconds 5 --readers 8 --writers 2
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from ..api.database.database import Base, create_db_engine
+from ..api.models.role import Role
+from ..api.models.user import User
+
+def run_profile(profile: str, args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_db_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}", profile=profile)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            conn.execute(insert(Role), [{"name": "viewer"}])
+            conn.execute(insert(User), [
+                {"username": f"seed{i}", "email": f"seed{i}@example.com", "hashed_password": "x", "role_id": 1}
+                for i in range(args.seed)
+            ])
+
+        totals = {"reads": 0, "writes": 0, "errors": 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + args.seconds
+
+        def reader():
+            reads = errors = 0
+            while time.monotonic() < deadline:
+                try:
+                    with engine.connect() as conn:
+                        conn.execute(select(User.username).where(User.id == random.randint(1, args.seed))).first()
+                    reads += 1
+                except OperationalError:
+                    errors += 1
+            with lock:
+                totals["reads"] += reads
+                totals["errors"] += errors
+
+        def writer(worker: int):
+            writes = errors = 0
+            while time.monotonic() < deadline:
+                name = f"w{worker}-{writes + errors}"
+                try:
+                    with engine.begin() as conn:
+                        conn.execute(insert(User).values(
+                            username=name, email=f"{name}@example.com", hashed_password="x", role_id=1
+                        ))
+                    writes += 1
+                except OperationalError:
+                    errors += 1
+            with lock:
+                totals["writes"] += writes
+                totals["errors"] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(args.readers)]
+        threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.dispose()
+
+    return {
+        "profile": profile,
+        "reads_per_second": round(totals["reads"] / args.seconds, 1),
+        "writes_per_second": round(totals["writes"] / args.seconds, 1),
+        "errors": totals["errors"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de concurrencia de SQLite por perfil")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=10000, help="Usuarios iniciales")
+    args = parser.parse_args()
+
+    results = [run_profile(profile, args) for profile in ("default", "production")]
+    print(json.dumps({"readers": args.readers, "writers": args.writers, "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# Micro-benchmark de decode_access_token con y sin la caché de tokens verificados.
+# Uso (desde la raíz del repositorio): python -m app.benchmarks.token_cache --iterations 20000
+import argparse
+import json
+import time
+from ..api.core.security import create_access_token, decode_access_token, token_cache, token_claims
+
+def _per_call_us(iterations: int, token: str, cached: bool) -> float:
+    if cached:
+        decode_access_token(token)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if not cached:
+            token_cache.clear()
+        decode_access_token(token)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del caché de tokens verificados")
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    token = create_access_token(data=token_claims(1, "benchmark", 1, "admin", 1))
+    miss_us = _per_call_us(args.iterations, token, cached=False)
+    hit_us = _per_call_us(args.iterations, token, cached=True)
+    print(json.dumps({
+        "iterations": args.iterations,
+        "uncached_us_per_call": round(miss_us, 2),
+        "cached_us_per_call": round(hit_us, 2),
+        "saving_us_per_request": round(miss_us - hit_us, 2),
+        "speedup": round(miss_us / hit_us, 1),
+        "cache": token_cache.stats(),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -1,62 +1,117 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from api.core.config import settings
-from api.database.database import Base
-from api.models.role import Role
-from api.models.user import User
-from api.core.security import get_password_hash
-
-# Configuración de la base de datos
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def init_db():
-    # Crear las tablas si no existen
-    Base.metadata.create_all(bind=engine)
-    
-    db = SessionLocal()
-    
+import argparse
+import time
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+from .api.core.security import get_password_hash
+from .api.database.database import create_db_engine
+from .api.database.schema import BULK_LOAD_TRIGGERS, ensure_schema
+from .api.models.role import Role
+from .api.models.user import User
+
+DEFAULT_ROLES = ["admin", "editor", "viewer"]
+ADMIN_USERNAME = "admin"
+ADMIN_EMAIL = "admin@example.com"
+ADMIN_PASSWORD = "adminpassword"  # Cambia esto por una contraseña segura en producción
+
+# Valores por defecto de los usuarios sintéticos (--users)
+SEED_PREFIX = "user"
+SEED_PASSWORD = "userpassword"
+SEED_ROLE = "viewer"
+
+def _insert_ignore(conn: Connection, table):
+    # INSERT ... ON CONFLICT DO NOTHING: volver a ejecutar el seed no falla ni duplica filas
+    insert = pg_insert if conn.dialect.name == "postgresql" else sqlite_insert
+    return insert(table).on_conflict_do_nothing()
+
+def seed_defaults(conn: Connection) -> None:
+    # Roles predeterminados y usuario admin
+    conn.execute(_insert_ignore(conn, Role), [{"name": role_name} for role_name in DEFAULT_ROLES])
+    # El admin solo se crea si falta: ni bcrypt ni escritura (que cambiaría su versión y sus ETags) en cada ejecución
+    if conn.scalar(select(User.id).where(User.username == ADMIN_USERNAME)) is not None:
+        return
+    admin_role_id = conn.scalar(select(Role.id).where(Role.name == "admin"))
+    conn.execute(_insert_ignore(conn, User), [{
+        "username": ADMIN_USERNAME,
+        "email": ADMIN_EMAIL,
+        "hashed_password": get_password_hash(ADMIN_PASSWORD),
+        "role_id": admin_role_id,
+    }])
+
+def seed_users(
+    engine: Engine,
+    count: int,
+    prefix: str = SEED_PREFIX,
+    password: str = SEED_PASSWORD,
+    role_name: str = SEED_ROLE,
+    batch_size: int = 50000,
+) -> int:
+    # Un único hash bcrypt para todos: hashear un millón de contraseñas llevaría horas
+    hashed_password = get_password_hash(password)
+    with engine.connect() as conn:
+        role_id = conn.scalar(select(Role.id).where(Role.name == role_name))
+        if role_id is None:
+            raise ValueError(f"Role '{role_name}' does not exist")
+        before = conn.scalar(select(func.count()).select_from(User))
+        suspended = []
+        # Los triggers se suspenden durante la carga (mucho más rápido que mantenerlos fila a fila);
+        # si el proceso muere antes de recrearlos, ensure_schema los restaura en el siguiente arranque
+        if conn.dialect.name == "sqlite":
+            existing = {name for (name,) in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            suspended = [trigger for trigger in BULK_LOAD_TRIGGERS if trigger[0] in existing]
+            for _, trigger_name, _, _ in suspended:
+                conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger_name}")
+            conn.commit()
+        statement = _insert_ignore(conn, User)
+        try:
+            # executemany por lotes, una transacción por lote
+            for start in range(0, count, batch_size):
+                conn.execute(statement, [
+                    {
+                        "username": f"{prefix}{i}",
+                        "email": f"{prefix}{i}@example.com",
+                        "hashed_password": hashed_password,
+                        "role_id": role_id,
+                    }
+                    for i in range(start, min(start + batch_size, count))
+                ])
+                conn.commit()
+        finally:
+            if suspended:
+                conn.rollback()
+                for _, _, create_trigger, rebuild in suspended:
+                    conn.exec_driver_sql(rebuild)
+                    conn.exec_driver_sql(create_trigger)
+                conn.commit()
+        return conn.scalar(select(func.count()).select_from(User)) - before
+
+def init_db(engine: Engine, users: int = 0, batch_size: int = 50000, prefix: str = SEED_PREFIX, password: str = SEED_PASSWORD) -> None:
+    # Crear o migrar el esquema si no está en la versión actual
+    with engine.begin() as conn:
+        ensure_schema(conn)
+        seed_defaults(conn)
+    print(f"Roles {', '.join(DEFAULT_ROLES)} y usuario '{ADMIN_USERNAME}' presentes.")
+
+    if users:
+        started = time.perf_counter()
+        inserted = seed_users(engine, users, prefix=prefix, password=password, batch_size=batch_size)
+        print(f"{inserted} usuarios sintéticos creados ({users - inserted} ya existían) en {time.perf_counter() - started:.1f}s.")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inicializa la base de datos y, opcionalmente, siembra usuarios sintéticos")
+    parser.add_argument("--users", type=int, default=0, help="Número de usuarios sintéticos a generar")
+    parser.add_argument("--batch-size", type=int, default=50000, help="Filas por executemany/transacción")
+    parser.add_argument("--prefix", default=SEED_PREFIX, help="Prefijo de username/email de los usuarios sintéticos")
+    parser.add_argument("--password", default=SEED_PASSWORD, help="Contraseña compartida por los usuarios sintéticos")
+    args = parser.parse_args()
+
+    # Configuración de la base de datos (mismo perfil que la API)
+    engine = create_db_engine()
     try:
-        # Crear roles predeterminados si no existen
-        roles = ['admin', 'editor', 'viewer']
-        for role_name in roles:
-            existing_role = db.query(Role).filter(Role.name == role_name).first()
-            if not existing_role:
-                new_role = Role(name=role_name)
-                db.add(new_role)
-                print(f"Rol '{role_name}' creado.")
-            else:
-                print(f"Rol '{role_name}' ya existe.")
-        
-        # Crear usuario admin predeterminado si no existe
-        admin_username = "admin"
-        admin_email = "admin@example.com"
-        admin_password = "adminpassword"  # Cambia esto por una contraseña segura en producción
-        admin_role = db.query(Role).filter(Role.name == "admin").first()
-        
-        if admin_role:
-            existing_user = db.query(User).filter(User.username == admin_username).first()
-            if not existing_user:
-                hashed_password = get_password_hash(admin_password)
-                new_user = User(
-                    username=admin_username,
-                    email=admin_email,
-                    hashed_password=hashed_password,
-                    role_id=admin_role.id
-                )
-                db.add(new_user)
-                print("Usuario admin creado.")
-            else:
-                print("Usuario admin ya existe.")
-        else:
-            print("Error: Rol 'admin' no encontrado.")
-        
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        print(f"Error durante la inicialización: {e}")
+        init_db(engine, users=args.users, batch_size=args.batch_size, prefix=args.prefix, password=args.password)
     finally:
-        db.close()
+        engine.dispose()
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    main()
@@ -1,17 +1,65 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from .api.database.database import engine, Base
-from .api.v1.endpoints import users, roles, auth
+from fastapi.responses import PlainTextResponse
+from .api.core.audit import audit_writer
+from .api.core.config import settings
+from .api.core.hashing import hashing_pool
+from .api.core.metrics import MetricsMiddleware, install_sql_listeners, registry
+from .api.core.revocation import revocation_store
+from .api.core.role_catalog import role_catalog
+from .api.core.security import token_cache
+from .api.core.user_cache import user_cache
+from .api.database.database import engine, AsyncSessionLocal, async_engine
+from .api.database.schema import ensure_schema_async
+from .api.dependencies.auth import token_version_cache
+from .api.v1.endpoints import users, roles, auth, audit
 
 
-# Crear las tablas en la base de datos
-Base.metadata.create_all(bind=engine)
+async def warm_up():
+    # Cargar la denylist de tokens revocados y el catálogo de roles antes de atender peticiones
+    async with AsyncSessionLocal() as db:
+        await revocation_store.sync(db, force=True)
+        await role_catalog.load(db)
 
-app = FastAPI(title="User Management API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Comprobación de la versión del esquema en lugar de create_all en cada import;
+    # se hace una vez por proceso (los workers de app.serve la heredan ya hecha)
+    await ensure_schema_async(async_engine)
+    await warm_up()
+    audit_writer.start(AsyncSessionLocal)
+    # Suscripción a las invalidaciones de la caché de usuarios (solo con Redis configurado)
+    await user_cache.start()
+    yield
+    await user_cache.stop()
+    # Volcar la auditoría pendiente antes de cerrar el pool
+    await audit_writer.stop()
+    # Liberar los workers de hashing y las conexiones del pool al apagar
+    hashing_pool.shutdown()
+    await async_engine.dispose()
+
+app = FastAPI(title="User Management API", lifespan=lifespan)
 
 # Incluir los routers
 app.include_router(users.router)
 app.include_router(roles.router)
 app.include_router(auth.router)
+app.include_router(audit.router)
+
+# Instrumentación: latencia por ruta, SQL, hashing y JWT
+if settings.METRICS_ENABLED:
+    install_sql_listeners(engine)
+    install_sql_listeners(async_engine.sync_engine)
+    registry.add_collector("password_hashing", hashing_pool.stats)
+    registry.add_collector("token_cache", token_cache.stats)
+    registry.add_collector("token_version_cache", token_version_cache.stats)
+    registry.add_collector("audit_log", audit_writer.stats)
+    registry.add_collector("user_cache", user_cache.stats)
+    app.add_middleware(MetricsMiddleware, server_timing=settings.METRICS_SERVER_TIMING)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/")
 def read_root():
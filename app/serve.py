@@ -0,0 +1,113 @@
+# Lanzador con preforking: importa la app una sola vez, comprueba el esquema y calienta las cachés,
+# y después crea N workers con fork que comparten el socket de escucha.
+# Uso (desde la raíz del repositorio): python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+import time
+
+_process_started = time.perf_counter()
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+from typing import Dict
+import uvicorn
+from .api.database.database import async_engine
+from .api.database.schema import ensure_schema_async
+from .main import app, warm_up
+
+_imported = time.perf_counter()
+
+class WorkerServer(uvicorn.Server):
+    # Servidor uvicorn que informa de su arranque en frío (desde el fork hasta aceptar conexiones)
+    def __init__(self, config: uvicorn.Config, worker: int, forked_at: float):
+        super().__init__(config)
+        self.worker = worker
+        self.forked_at = forked_at
+
+    async def startup(self, sockets=None) -> None:
+        await super().startup(sockets=sockets)
+        _report(
+            event="worker_ready",
+            worker=self.worker,
+            pid=os.getpid(),
+            cold_start_ms=round((time.perf_counter() - self.forked_at) * 1000, 1),
+        )
+
+def _report(**fields) -> None:
+    print(json.dumps(fields), flush=True)
+
+async def prepare() -> None:
+    # Esquema y cachés en el proceso padre: los workers heredan el resultado
+    await ensure_schema_async(async_engine)
+    await warm_up()
+    # Sin conexiones abiertas al hacer fork: cada worker abre las suyas
+    await async_engine.dispose()
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def _run_worker(worker: int, sock: socket.socket, forked_at: float, args) -> None:
+    config = uvicorn.Config(app, lifespan="on", log_level=args.log_level, access_log=args.access_log)
+    WorkerServer(config, worker, forked_at).run(sockets=[sock])
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de la API con workers preforked")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="warning")
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(prepare())
+    sock = _bind(args.host, args.port, args.backlog)
+    _report(
+        event="preloaded",
+        pid=os.getpid(),
+        import_ms=round((_imported - _process_started) * 1000, 1),
+        preload_ms=round((time.perf_counter() - _process_started) * 1000, 1),
+        workers=args.workers,
+        address=f"{args.host}:{args.port}",
+    )
+
+    children: Dict[int, int] = {}
+    for worker in range(args.workers):
+        forked_at = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _run_worker(worker, sock, forked_at, args)
+            finally:
+                os._exit(0)
+        children[pid] = worker
+
+    def _stop(signum, frame):
+        # Reenviar la señal: cada worker cierra sus conexiones y ejecuta el shutdown del lifespan
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker = children.pop(pid, None)
+        if worker is not None:
+            _report(event="worker_exit", worker=worker, pid=pid, status=os.waitstatus_to_exitcode(status))
+    sock.close()
+
+if __name__ == "__main__":
+    main()